@@ -0,0 +1,353 @@
+# batch.py
+# Vectorised attack, check and legal move count computation over many positions at once.
+#
+#   batch = PositionBatch.from_fens(fens)
+#   batch.in_check()           # (N,) bool
+#   batch.attacked_squares(0)  # (N,) uint64, squares attacked by white
+#   batch.legal_move_counts()  # (N,) int64
+#
+# Positions are held as uint64 bitboards (same square numbering as board.py, a8 = 0 ... h1 = 63)
+# and every operation works on whole columns of the batch, so the per-position Python cost is
+# paid once when loading instead of at every step. Requires NumPy.
+import numpy as np
+
+from board import Board, NO_EN_PASSANT
+from piece import PIECES_BY_SYMBOL, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+U64 = np.uint64
+EMPTY = U64(0)
+ALL = U64(0xFFFFFFFFFFFFFFFF)
+FILE_A = U64(0x0101010101010101)
+FILE_H = U64(0x8080808080808080)
+NOT_A = ALL ^ FILE_A
+NOT_H = ALL ^ FILE_H
+NOT_AB = NOT_A & (ALL ^ (FILE_A << U64(1)))
+NOT_GH = NOT_H & (ALL ^ (FILE_H >> U64(1)))
+ROW_MASKS = [U64(0xFF << (8 * row)) for row in range(8)]
+
+# Sliding directions as (square delta, mask of valid destination squares).
+# A step east lands on col + 1, so it can never land on the a-file (and west never on the h-file).
+EAST, WEST, SOUTH, NORTH = (1, NOT_A), (-1, NOT_H), (8, ALL), (-8, ALL)
+SOUTH_EAST, SOUTH_WEST, NORTH_EAST, NORTH_WEST = (9, NOT_A), (7, NOT_H), (-7, NOT_A), (-9, NOT_H)
+ROOK_DIRECTIONS = (EAST, WEST, SOUTH, NORTH)
+BISHOP_DIRECTIONS = (SOUTH_EAST, SOUTH_WEST, NORTH_EAST, NORTH_WEST)
+# The line (0-3) each direction lies on, for pins: a piece pinned on a line may still move along it
+DIRECTION_LINES = {EAST: 0, WEST: 0, SOUTH: 1, NORTH: 1, SOUTH_EAST: 2, NORTH_WEST: 2, SOUTH_WEST: 3, NORTH_EAST: 3}
+
+KNIGHT_STEPS = ((-17, NOT_H), (-15, NOT_A), (-10, NOT_GH), (-6, NOT_AB),
+                (6, NOT_GH), (10, NOT_AB), (15, NOT_H), (17, NOT_A))
+KING_STEPS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+CASTLING_BITS = {'K': 1, 'Q': 2, 'k': 4, 'q': 8}
+
+# Board.to_bytes layout as a structured dtype, for reading packed records without copying
+PACKED_DTYPE = np.dtype([
+    ('occupied', '<u8'), ('nibbles', 'u1', (16,)), ('flags', 'u1'), ('ep_square', 'u1'),
+    ('halfmove_clock', '<u2'), ('fullmove_number', '<u2'), ('reserved', '<u2'),
+])
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bb):
+    """Number of set bits in each element of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bb).astype(np.int64)
+    bytes_view = np.ascontiguousarray(bb, dtype='<u8').view(np.uint8).reshape(bb.shape + (8,))
+    return _POPCOUNT8[bytes_view].sum(axis=-1, dtype=np.int64)
+
+
+def shift(bb, delta):
+    """Moves every bit by 'delta' squares; bits shifted off the board are dropped."""
+    return bb << U64(delta) if delta > 0 else bb >> U64(-delta)
+
+
+def step(bb, direction):
+    delta, mask = direction
+    return shift(bb, delta) & mask
+
+
+def ray_attacks(sliders, empty, direction):
+    """
+    Squares attacked by 'sliders' in one direction, up to and including the first blocker
+    (Kogge-Stone fill: three shift rounds instead of one round per square).
+    """
+    delta, mask = direction
+    empty = empty & mask
+    sliders = sliders | (empty & shift(sliders, delta))
+    empty = empty & shift(empty, delta)
+    sliders = sliders | (empty & shift(sliders, 2 * delta))
+    empty = empty & shift(empty, 2 * delta)
+    sliders = sliders | (empty & shift(sliders, 4 * delta))
+    return shift(sliders, delta) & mask
+
+
+def pawn_attacks(pawns, color_code):
+    """Squares attacked by the given pawns of one color (white pawns attack toward row 0)."""
+    if color_code == WHITE:
+        return step(pawns, NORTH_WEST) | step(pawns, NORTH_EAST)
+    return step(pawns, SOUTH_WEST) | step(pawns, SOUTH_EAST)
+
+
+def knight_attacks(knights):
+    attacks = np.zeros_like(knights)
+    for knight_step in KNIGHT_STEPS:
+        attacks |= step(knights, knight_step)
+    return attacks
+
+
+def king_attacks(kings):
+    attacks = np.zeros_like(kings)
+    for king_step in KING_STEPS:
+        attacks |= step(kings, king_step)
+    return attacks
+
+
+class PositionBatch:
+    """
+    N positions as parallel arrays:
+    bitboards (N, 12) uint64 indexed by piece.index, turn (N,) color codes,
+    castling (N,) K=1 Q=2 k=4 q=8 bits, ep_square (N,) square index or -1.
+    """
+
+    def __init__(self, bitboards, turn, castling, ep_square, fens=None, packed=None):
+        self.bitboards = bitboards
+        self.turn = turn
+        self.castling = castling
+        self.ep_square = ep_square
+        # The source positions, kept to rebuild a Board for the rare rows that need one
+        self.fens = fens
+        self.packed = packed
+
+    def __len__(self):
+        return len(self.turn)
+
+    @classmethod
+    def from_fens(cls, fens):
+        """Builds a batch from FEN strings (only the first four fields are used)."""
+        fens = list(fens)
+        bitboards = []
+        turns = []
+        castling = []
+        ep_squares = []
+        for fen in fens:
+            placement, active, rights, ep = fen.split(' ', 4)[:4]
+            boards = [0] * 12
+            sq = 0
+            for char in placement:
+                if char == '/':
+                    continue
+                if char.isdigit():
+                    sq += int(char)
+                else:
+                    piece = PIECES_BY_SYMBOL.get(char)
+                    if piece is None:
+                        raise ValueError(f"Invalid piece character in FEN: {char}")
+                    boards[piece.index] |= 1 << sq
+                    sq += 1
+            if sq != 64:
+                raise ValueError(f"Invalid FEN piece placement format: {placement}")
+            bitboards.append(boards)
+            turns.append(WHITE if active == 'w' else BLACK)
+            castling.append(sum(CASTLING_BITS[right] for right in rights if right in CASTLING_BITS))
+            ep_squares.append(-1 if ep == '-' else (8 - int(ep[1])) * 8 + ord(ep[0]) - ord('a'))
+        return cls(np.array(bitboards, dtype=np.uint64).reshape(len(fens), 12),
+                   np.array(turns, dtype=np.uint8),
+                   np.array(castling, dtype=np.uint8),
+                   np.array(ep_squares, dtype=np.int8),
+                   fens)
+
+    @classmethod
+    def from_packed(cls, data):
+        """
+        Builds a batch from consecutive Board.to_bytes records, e.g. PositionStore.view().
+        The records are read in place; only the unpacked bitboards are new arrays.
+        """
+        records = np.frombuffer(data, dtype=PACKED_DTYPE)
+        count = len(records)
+        occupied = records['occupied']
+        nibble_bytes = records['nibbles']
+        nibbles = np.empty((count, 32), dtype=np.uint8)
+        nibbles[:, 0::2] = nibble_bytes & 0xF
+        nibbles[:, 1::2] = nibble_bytes >> 4
+
+        # Walk the squares in order; each occupied square takes the next nibble of its row
+        bitboards = np.zeros((count, 12), dtype=np.uint64)
+        slot = np.zeros(count, dtype=np.int64)
+        rows = np.arange(count)
+        for sq in range(64):
+            present = ((occupied >> U64(sq)) & U64(1)) != EMPTY
+            occupied_rows = rows[present]
+            bitboards[occupied_rows, nibbles[occupied_rows, slot[occupied_rows]]] |= U64(1 << sq)
+            slot += present
+
+        flags = records['flags']
+        ep_square = records['ep_square'].astype(np.int8)
+        ep_square[records['ep_square'] == NO_EN_PASSANT] = -1
+        return cls(bitboards, flags & 1, (flags >> 1) & 0xF, ep_square, packed=records)
+
+    @classmethod
+    def from_boards(cls, boards):
+        return cls.from_fens(board.to_fen() for board in boards)
+
+    def occupancy_tensor(self):
+        """(N, 12, 64) uint8 tensor: [n, piece.index, sq] is 1 where that piece stands."""
+        bits = np.unpackbits(np.ascontiguousarray(self.bitboards, dtype='<u8').view(np.uint8), bitorder='little')
+        return bits.reshape(len(self), 12, 64)
+
+    # --- Per-side views ---
+
+    def _pieces(self, color_code, type_code):
+        return self.bitboards[:, color_code * 6 + type_code]
+
+    def _side_pieces(self, side, type_code):
+        """Pieces of 'side', a per-position color code array, e.g. the side to move."""
+        return np.where(side == WHITE, self._pieces(WHITE, type_code), self._pieces(BLACK, type_code))
+
+    def occupancy(self):
+        return np.bitwise_or.reduce(self.bitboards, axis=1)
+
+    # --- Attacks ---
+
+    def _attacks(self, pawns, knights, bishops, rooks, queens, kings, white_pawns, empty):
+        """Union of the attacks of the given piece sets; white_pawns selects the pawn direction per position."""
+        attacks = np.where(white_pawns, pawn_attacks(pawns, WHITE), pawn_attacks(pawns, BLACK))
+        attacks |= knight_attacks(knights) | king_attacks(kings)
+        diagonal = bishops | queens
+        orthogonal = rooks | queens
+        for direction in BISHOP_DIRECTIONS:
+            attacks |= ray_attacks(diagonal, empty, direction)
+        for direction in ROOK_DIRECTIONS:
+            attacks |= ray_attacks(orthogonal, empty, direction)
+        return attacks
+
+    def attacked_squares(self, color_code):
+        """(N,) uint64: the squares attacked by 'color_code' in each position."""
+        pieces = [self._pieces(color_code, type_code) for type_code in range(6)]
+        white_pawns = np.full(len(self), color_code == WHITE)
+        return self._attacks(*pieces, white_pawns, ~self.occupancy())
+
+    def in_check(self):
+        """(N,) bool: True where the side to move is in check."""
+        them = 1 - self.turn
+        pieces = [self._side_pieces(them, type_code) for type_code in range(6)]
+        attacked = self._attacks(*pieces, them == WHITE, ~self.occupancy())
+        return (attacked & self._side_pieces(self.turn, KING)) != EMPTY
+
+    # --- Legal move counting ---
+
+    def legal_move_counts(self):
+        """
+        (N,) int64: the number of legal moves in each position, computed without generating moves.
+        Sliding moves are counted one direction at a time: rays of one side in the same direction
+        never overlap, so the popcount of their union is the sum of the per-piece counts.
+        Positions where an en passant capture is possible are counted by Board instead.
+        """
+        us = self.turn
+        them = 1 - us
+        white = us == WHITE
+        own_pieces = [self._side_pieces(us, type_code) for type_code in range(6)]
+        enemy_pieces = [self._side_pieces(them, type_code) for type_code in range(6)]
+        own = np.bitwise_or.reduce(np.stack(own_pieces), axis=0)
+        enemies = np.bitwise_or.reduce(np.stack(enemy_pieces), axis=0)
+        occupied = own | enemies
+        empty = ~occupied
+        king = own_pieces[KING]
+
+        # Squares the king may not step to: enemy attacks with the king lifted off its square,
+        # so a checking slider also covers the squares behind the king.
+        danger = self._attacks(*enemy_pieces, them == WHITE, empty | king)
+
+        # Checkers and the squares a check can be blocked on
+        enemy_diagonal = enemy_pieces[BISHOP] | enemy_pieces[QUEEN]
+        enemy_orthogonal = enemy_pieces[ROOK] | enemy_pieces[QUEEN]
+        checkers = (np.where(white, pawn_attacks(king, WHITE), pawn_attacks(king, BLACK)) & enemy_pieces[PAWN]) \
+            | (knight_attacks(king) & enemy_pieces[KNIGHT])
+        block_squares = np.zeros_like(king)
+        # Pinned pieces, grouped by the line they are pinned on
+        pinned_on_line = [np.zeros_like(king) for _ in range(4)]
+        for directions, enemy_sliders in ((BISHOP_DIRECTIONS, enemy_diagonal), (ROOK_DIRECTIONS, enemy_orthogonal)):
+            for direction in directions:
+                ray = ray_attacks(king, empty, direction)
+                checker = ray & enemy_sliders
+                checkers |= checker
+                block_squares |= np.where(checker != EMPTY, ray & ~checker, EMPTY)
+                # X-ray through one of our pieces: if an enemy slider is behind it, it is pinned
+                candidate = ray & own
+                xray = ray_attacks(king, empty | candidate, direction)
+                pinner = xray & ~ray & enemy_sliders
+                pinned_on_line[DIRECTION_LINES[direction]] |= np.where(pinner != EMPTY, candidate, EMPTY)
+        pinned = pinned_on_line[0] | pinned_on_line[1] | pinned_on_line[2] | pinned_on_line[3]
+
+        checker_count = popcount(checkers)
+        target_mask = np.where(checker_count == 0, ALL, checkers | block_squares)
+        targets = ~own & target_mask
+
+        counts = popcount(king_attacks(king) & ~own & ~danger)
+
+        # Knights: a pinned knight never moves; each knight step reaches a distinct square per knight
+        piece_moves = np.zeros(len(self), dtype=np.int64)
+        knights = own_pieces[KNIGHT] & ~pinned
+        for knight_step in KNIGHT_STEPS:
+            piece_moves += popcount(step(knights, knight_step) & targets)
+
+        # Sliders: a pinned slider only moves along its pin line
+        for directions, sliders in ((BISHOP_DIRECTIONS, own_pieces[BISHOP] | own_pieces[QUEEN]),
+                                    (ROOK_DIRECTIONS, own_pieces[ROOK] | own_pieces[QUEEN])):
+            for direction in directions:
+                movable = (sliders & ~pinned) | (sliders & pinned_on_line[DIRECTION_LINES[direction]])
+                piece_moves += popcount(ray_attacks(movable, empty, direction) & targets)
+
+        # Pawns: pushes along the file, captures along the diagonals; promotions count four times
+        pawns = own_pieces[PAWN]
+        promotion_rank = np.where(white, ROW_MASKS[0], ROW_MASKS[7])
+        double_push_rank = np.where(white, ROW_MASKS[5], ROW_MASKS[2])
+        pushers = (pawns & ~pinned) | (pawns & pinned_on_line[DIRECTION_LINES[NORTH]])
+        single = np.where(white, step(pushers, NORTH), step(pushers, SOUTH)) & empty
+        double = np.where(white, step(single & double_push_rank, NORTH), step(single & double_push_rank, SOUTH)) & empty
+        single &= target_mask
+        double &= target_mask
+        piece_moves += popcount(single & ~promotion_rank) + 4 * popcount(single & promotion_rank) + popcount(double)
+        for white_direction, black_direction in ((NORTH_WEST, SOUTH_EAST), (NORTH_EAST, SOUTH_WEST)):
+            # Both directions of a pair lie on the same line
+            capturers = (pawns & ~pinned) | (pawns & pinned_on_line[DIRECTION_LINES[white_direction]])
+            captures = np.where(white, step(capturers, white_direction), step(capturers, black_direction)) & enemies & target_mask
+            piece_moves += popcount(captures & ~promotion_rank) + 4 * popcount(captures & promotion_rank)
+
+        # Castling: rights, rook on its corner, empty path, no check and no attacked square crossed
+        row_base = np.where(white, U64(56), U64(0))
+        kingside_right = np.where(white, self.castling & 1, self.castling & 4) != 0
+        queenside_right = np.where(white, self.castling & 2, self.castling & 8) != 0
+        home = (king == (U64(1) << (row_base + U64(4)))) & (checker_count == 0)
+        rooks = own_pieces[ROOK]
+        kingside_path = U64(0b11) << (row_base + U64(5))
+        queenside_path = U64(0b111) << (row_base + U64(1))
+        queenside_king_path = U64(0b11) << (row_base + U64(2))
+        piece_moves += (home & kingside_right & ((rooks & (U64(1) << (row_base + U64(7)))) != EMPTY)
+                        & ((occupied & kingside_path) == EMPTY) & ((danger & kingside_path) == EMPTY))
+        piece_moves += (home & queenside_right & ((rooks & (U64(1) << row_base)) != EMPTY)
+                        & ((occupied & queenside_path) == EMPTY) & ((danger & queenside_king_path) == EMPTY))
+
+        # In double check only the king moves
+        counts += np.where(checker_count > 1, 0, piece_moves)
+
+        # En passant needs the two-pawns-leave-the-rank pin test: count those few positions exactly
+        ep_rows = np.nonzero(self.ep_square >= 0)[0]
+        for row in ep_rows:
+            ep_bit = U64(1) << U64(int(self.ep_square[row]))
+            capturers = pawn_attacks(np.array([ep_bit]), int(them[row]))[0] & own_pieces[PAWN][row]
+            if capturers != EMPTY:
+                counts[row] = len(self._board(row).generate_legal_moves())
+        return counts
+
+    def _board(self, row):
+        if self.fens is not None:
+            # from_fens also takes 4-field FEN/EPD positions; Board needs the clocks too
+            fields = self.fens[row].split()
+            clocks = fields[4:6] if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit() else ['0', '1']
+            return Board(fen=' '.join(fields[:4] + clocks))
+        if self.packed is not None:
+            board = Board()
+            board.from_bytes(self.packed[row].tobytes())
+            return board
+        raise ValueError("This batch has no source positions to rebuild boards from.")
@@ -1,7 +1,150 @@
 # board.py
-import copy
-from piece import Piece
-from move import Move
+import random
+import struct
+from piece import (
+    PIECES, PIECES_BY_SYMBOL, COLOR_CODES,
+    WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+)
+from tracing import BOARD as BOARD_TRACE, MOVEGEN as MOVEGEN_TRACE
+from endgame import MATERIAL_UNITS, MATERIAL_SHIFT, is_insufficient_material
+from move import (
+    Move, encode_move, SQUARE_MASK, TO_SHIFT, PROMOTION_SHIFT, PROMOTION_MASK,
+    FLAG_CAPTURE, FLAG_CASTLING, FLAG_EN_PASSANT,
+)
+
+# --- Bitboard geometry ---
+# Squares are numbered row * 8 + col, the same orientation as board_state:
+# a8 = 0, h8 = 7, a1 = 56, h1 = 63. Bit n of a bitboard is set when square n holds a piece.
+# Bitboards are indexed by the piece.py color and type codes.
+
+KNIGHT_DELTAS = [
+    (-2, -1), (-2, 1), (-1, -2), (-1, 2),
+    (1, -2), (1, 2), (2, -1), (2, 1)
+]
+KING_DELTAS = [
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1),           (0, 1),
+    (1, -1), (1, 0), (1, 1)
+]
+
+
+def _build_step_table(deltas):
+    """For every square, the bitboard of squares reachable with one of the given (dr, dc) steps."""
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in deltas:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < 8 and 0 <= nc < 8:
+                mask |= 1 << (nr * 8 + nc)
+        table.append(mask)
+    return table
+
+
+def _build_ray_table(dr, dc):
+    """For every square, the bitboard of squares beyond it in direction (dr, dc), up to the edge."""
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        r, c = r + dr, c + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            mask |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _build_step_table(KNIGHT_DELTAS)
+KING_ATTACKS = _build_step_table(KING_DELTAS)
+# PAWN_ATTACKS[color_index][sq]: squares attacked by a pawn of that color standing on sq.
+PAWN_ATTACKS = [
+    _build_step_table([(-1, -1), (-1, 1)]), # White pawns attack towards row 0
+    _build_step_table([(1, -1), (1, 1)]),   # Black pawns attack towards row 7
+]
+
+# Along "positive" rays the square index grows, so the nearest blocker is the lowest set bit;
+# along "negative" rays it is the highest set bit.
+ROOK_RAYS_POSITIVE = [_build_ray_table(1, 0), _build_ray_table(0, 1)]
+ROOK_RAYS_NEGATIVE = [_build_ray_table(-1, 0), _build_ray_table(0, -1)]
+BISHOP_RAYS_POSITIVE = [_build_ray_table(1, -1), _build_ray_table(1, 1)]
+BISHOP_RAYS_NEGATIVE = [_build_ray_table(-1, -1), _build_ray_table(-1, 1)]
+
+
+def _sliding_attacks(sq, occupied, positive_rays, negative_rays):
+    attacks = 0
+    for rays in positive_rays:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            # Cut the ray behind the first blocker (the blocker itself stays attacked)
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negative_rays:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    """Squares a rook on sq attacks, given the occupancy bitboard."""
+    return _sliding_attacks(sq, occupied, ROOK_RAYS_POSITIVE, ROOK_RAYS_NEGATIVE)
+
+
+def bishop_attacks(sq, occupied):
+    """Squares a bishop on sq attacks, given the occupancy bitboard."""
+    return _sliding_attacks(sq, occupied, BISHOP_RAYS_POSITIVE, BISHOP_RAYS_NEGATIVE)
+
+
+def queen_attacks(sq, occupied):
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+def popcount(bb):
+    """The number of set bits of a bitboard (int.bit_count needs Python 3.10)."""
+    return bin(bb).count('1')
+
+
+def _build_between_table():
+    """BETWEEN[a][b]: squares strictly between a and b if they share a rank, file or diagonal, else 0."""
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for dr, dc in KING_DELTAS:
+            r, c = divmod(sq, 8)
+            passed = 0
+            r, c = r + dr, c + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                table[sq][r * 8 + c] = passed
+                passed |= 1 << (r * 8 + c)
+                r, c = r + dr, c + dc
+    return table
+
+
+BETWEEN = _build_between_table()
+ALL_SQUARES = (1 << 64) - 1
+# Bit-sliced attacker counters need 5 planes: no square can have more than 31 attackers of one color
+ATTACK_PLANES = 5
+# Binary position layout, see Board.to_bytes
+_PACKED_POSITION = struct.Struct('<Q16sBBHHH')
+PACKED_POSITION_SIZE = _PACKED_POSITION.size # 32
+NO_EN_PASSANT = 0xFF
+# Rook home squares and the castling right tied to each
+CORNER_CASTLING_RIGHTS = {56: 'Q', 63: 'K', 0: 'q', 7: 'k'}
+
+# --- Zobrist hashing ---
+# A position key is the XOR of one random 64-bit number per (piece, square) on the board, one for
+# the set of castling rights, one for the en passant file and one when black is to move.
+# The fixed seed keeps keys identical across runs and processes.
+_zobrist_random = random.Random(0x5EED_C4E55)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)] # [piece.index][sq]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)] # [K | Q << 1 | k << 2 | q << 3]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)] # [file]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
 
 class Board:
     def __init__(self, fen=None):
@@ -12,6 +155,25 @@ class Board:
         self.halfmove_clock = 0
         self.fullmove_number = 1
         self.king_position = {'white': None, 'black': None}
+        # Bitboards, kept in sync with board_state: bitboards[color_code][type_code]
+        # plus one occupancy bitboard per color.
+        self.bitboards = [[0] * 6, [0] * 6]
+        self.occupancy = [0, 0]
+        # One undo record per move made, popped by unmake_move to restore the previous state
+        self.undo_stack = []
+        # Attack maps, updated incrementally by make_move / unmake_move:
+        # attack_planes[color_code] holds per-square attacker counts bit-sliced over ATTACK_PLANES
+        # bitboards (bit sq of plane i is bit i of that square's count), and attacks_from[sq] is
+        # the attack bitboard of the piece on sq.
+        self.attack_planes = [[0] * ATTACK_PLANES, [0] * ATTACK_PLANES]
+        self.attacks_from = [0] * 64
+        # Zobrist keys of the whole position and of the pawns alone, updated incrementally
+        self.zobrist_key = 0
+        self.pawn_key = 0
+        # zobrist_key of the position before each move made, for repetition detection
+        self.key_history = []
+        # Piece counts packed 4 bits per piece kind (see endgame.py), updated by captures and promotions
+        self.material_key = 0
 
         if fen:
             self.from_fen(fen)
@@ -22,13 +184,33 @@ class Board:
         initial_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
         self.from_fen(initial_fen)
 
-    def from_fen(self, fen_string):
+    def _clear(self):
+        """Empties the board and resets all state ahead of loading a position."""
         self.board_state = [[None for _ in range(8)] for _ in range(8)]
         self.castling_rights = {'K': False, 'Q': False, 'k': False, 'q': False}
         self.en_passant_target = None
         self.halfmove_clock = 0
         self.fullmove_number = 1
         self.king_position = {'white': None, 'black': None}
+        self.bitboards = [[0] * 6, [0] * 6]
+        self.occupancy = [0, 0]
+        self.undo_stack = []
+        self.zobrist_key = 0
+        self.pawn_key = 0
+        self.key_history = []
+
+    def _finish_loading(self):
+        """Computes the derived state (keys, attack maps) once pieces and flags are in place."""
+        self.zobrist_key ^= self._state_key() # The pieces were hashed as they were placed
+        self.material_key = 0
+        for color_code in range(2):
+            for type_code in range(6):
+                count = popcount(self.bitboards[color_code][type_code])
+                self.material_key += count << ((color_code * 6 + type_code) * MATERIAL_SHIFT)
+        self._rebuild_attack_maps()
+
+    def from_fen(self, fen_string):
+        self._clear()
 
         parts = fen_string.split(' ')
         if len(parts) != 6:
@@ -45,17 +227,13 @@ class Board:
             elif char.isdigit():
                 col_idx += int(char)
             else:
-                color = 'white' if char.isupper() else 'black'
-                piece_type_map = {
-                    'p': 'pawn', 'n': 'knight', 'b': 'bishop',
-                    'r': 'rook', 'q': 'queen', 'k': 'king'
-                }
-                piece_type = piece_type_map[char.lower()]
-                piece = Piece(piece_type, color)
-                self.board_state[row_idx][col_idx] = piece
-
-                if piece.type == 'king':
-                    self.king_position[color] = (row_idx, col_idx)
+                piece = PIECES_BY_SYMBOL.get(char)
+                if piece is None:
+                    raise ValueError(f"Invalid piece character in FEN: {char}")
+                self._put_piece(row_idx, col_idx, piece)
+
+                if piece.type_code == KING:
+                    self.king_position[piece.color] = (row_idx, col_idx)
                 col_idx += 1
         
         if row_idx != 7 or col_idx != 8:
@@ -109,6 +287,8 @@ class Board:
         if self.fullmove_number < 1:
             raise ValueError(f"Fullmove number must be at least 1: {self.fullmove_number}")
 
+        self._finish_loading()
+
     def to_fen(self):
         ranks = []
         for row in self.board_state:
@@ -145,17 +325,71 @@ class Board:
         return f"{piece_placement_fen} {active_color_fen} {castling_fen} {en_passant_fen} {self.halfmove_clock} {self.fullmove_number}"
 
 
-    def _copy(self):
-        new_board = Board(fen=self.to_fen())
-        
-        if new_board.king_position['white'] is None or new_board.king_position['black'] is None:
-            for r in range(8):
-                for c in range(8):
-                    piece = new_board.board_state[r][c]
-                    if piece and piece.type == 'king':
-                        new_board.king_position[piece.color] = (r, c)
-            
-        return new_board
+    def to_bytes(self):
+        """
+        Packs the position into PACKED_POSITION_SIZE (32) bytes:
+          0-7    occupancy bitboard (little endian, bit sq set when sq holds a piece)
+          8-23   one 4-bit piece index per occupied square, in square order (low nibble first)
+          24     bit 0 black to move, bits 1-4 castling rights K, Q, k, q
+          25     en passant square, or NO_EN_PASSANT
+          26-29  halfmove clock, fullmove number (16 bits each)
+          30-31  reserved, zero
+        """
+        occupied = self.occupancy[0] | self.occupancy[1]
+        nibbles = 0
+        shift = 0
+        board_state = self.board_state
+        bb = occupied
+        while bb:
+            lsb = bb & -bb
+            bb ^= lsb
+            sq = lsb.bit_length() - 1
+            nibbles |= board_state[sq >> 3][sq & 7].index << shift
+            shift += 4
+        if shift > 128:
+            raise ValueError(f"Cannot pack a position with more than 32 pieces: {self.to_fen()}")
+
+        rights = self.castling_rights
+        flags = (self.turn == 'black') | (rights['K'] << 1) | (rights['Q'] << 2) | (rights['k'] << 3) | (rights['q'] << 4)
+        if self.en_passant_target:
+            ep_square = self.en_passant_target[0] * 8 + self.en_passant_target[1]
+        else:
+            ep_square = NO_EN_PASSANT
+        return _PACKED_POSITION.pack(occupied, nibbles.to_bytes(16, 'little'), flags, ep_square,
+                                     min(self.halfmove_clock, 0xFFFF), min(self.fullmove_number, 0xFFFF), 0)
+
+    def from_bytes(self, data):
+        """Loads a position packed by to_bytes (any 32-byte buffer: bytes, memoryview, mmap slice)."""
+        if len(data) != PACKED_POSITION_SIZE:
+            raise ValueError(f"Packed position must be {PACKED_POSITION_SIZE} bytes, got {len(data)}.")
+        occupied, nibble_bytes, flags, ep_square, halfmove_clock, fullmove_number, _ = _PACKED_POSITION.unpack(data)
+        self._clear()
+
+        nibbles = int.from_bytes(nibble_bytes, 'little')
+        bb = occupied
+        while bb:
+            lsb = bb & -bb
+            bb ^= lsb
+            sq = lsb.bit_length() - 1
+            index = nibbles & 0xF
+            nibbles >>= 4
+            if index >= len(PIECES):
+                raise ValueError(f"Invalid piece index {index} in packed position.")
+            piece = PIECES[index]
+            self._put_piece(sq >> 3, sq & 7, piece)
+            if piece.type_code == KING:
+                self.king_position[piece.color] = (sq >> 3, sq & 7)
+
+        self.turn = 'black' if flags & 1 else 'white'
+        for bit, right in ((2, 'K'), (4, 'Q'), (8, 'k'), (16, 'q')):
+            self.castling_rights[right] = bool(flags & bit)
+        if ep_square != NO_EN_PASSANT:
+            if ep_square >= 64:
+                raise ValueError(f"Invalid en passant square {ep_square} in packed position.")
+            self.en_passant_target = (ep_square >> 3, ep_square & 7)
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = max(fullmove_number, 1)
+        self._finish_loading()
 
     def get_piece_at(self, r, c):
         if not (0 <= r < 8 and 0 <= c < 8):
@@ -168,386 +402,769 @@ class Board:
     def is_square_empty(self, r, c):
         return self.get_piece_at(r, c) is None
 
-    def is_square_attacked(self, r, c, by_color):
+    def _put_piece(self, r, c, piece):
+        """Places a piece on an empty square, updating board_state, the bitboards and the keys together."""
+        self.board_state[r][c] = piece
+        sq = r * 8 + c
+        bit = 1 << sq
+        self.bitboards[piece.color_code][piece.type_code] |= bit
+        self.occupancy[piece.color_code] |= bit
+        piece_key = ZOBRIST_PIECES[piece.index][sq]
+        self.zobrist_key ^= piece_key
+        if piece.type_code == PAWN:
+            self.pawn_key ^= piece_key
+
+    def _remove_piece(self, r, c):
+        """Removes and returns the piece on (r, c), or None if the square is empty."""
+        piece = self.board_state[r][c]
+        if piece is not None:
+            self.board_state[r][c] = None
+            sq = r * 8 + c
+            bit = 1 << sq
+            self.bitboards[piece.color_code][piece.type_code] ^= bit
+            self.occupancy[piece.color_code] ^= bit
+            piece_key = ZOBRIST_PIECES[piece.index][sq]
+            self.zobrist_key ^= piece_key
+            if piece.type_code == PAWN:
+                self.pawn_key ^= piece_key
+        return piece
+
+    def _state_key(self):
         """
-        Checks if the square (r, c) is attacked by any piece of 'by_color'.
+        The Zobrist key part for castling rights, en passant file and side to move.
+        The en passant file only counts when a pawn of the side to move could capture there, as in
+        FIDE's definition of a repeated position: otherwise a double pawn push would never repeat.
         """
-        print(f"  --> is_square_attacked: Checking if ({r},{c}) attacked by {by_color}")
-        
-        # --- 1. Pawn attacks ---
-        pawn_dir = -1 if by_color == 'white' else 1
-        for dc in [-1, 1]:
-            target_r, target_c = r + pawn_dir, c + dc
-            if self.is_square_valid(target_r, target_c):
-                piece = self.get_piece_at(target_r, target_c)
-                if piece and piece.type == 'pawn' and piece.color == by_color:
-                    print(f"    Pawn attack from ({target_r},{target_c}) {piece}")
-                    return True
+        rights = self.castling_rights
+        key = ZOBRIST_CASTLING[rights['K'] | (rights['Q'] << 1) | (rights['k'] << 2) | (rights['q'] << 3)]
+        stm = WHITE if self.turn == 'white' else BLACK
+        if self.en_passant_target:
+            row, col = self.en_passant_target
+            # The squares a capturing pawn can stand on are those an enemy pawn on the target attacks
+            if PAWN_ATTACKS[stm ^ 1][row * 8 + col] & self.bitboards[stm][PAWN]:
+                key ^= ZOBRIST_EN_PASSANT[col]
+        if stm == BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
 
-        # --- 2. Knight attacks ---
-        knight_moves = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
-        for dr, dc in knight_moves:
-            target_r, target_c = r + dr, c + dc
-            if self.is_square_valid(target_r, target_c):
-                piece = self.get_piece_at(target_r, target_c)
-                if piece and piece.type == 'knight' and piece.color == by_color:
-                    print(f"    Knight attack from ({target_r},{target_c}) {piece}")
-                    return True
+    def _attacks_of(self, sq, piece, occupied):
+        """Squares attacked by 'piece' standing on sq."""
+        type_code = piece.type_code
+        if type_code == PAWN:
+            return PAWN_ATTACKS[piece.color_code][sq]
+        if type_code == KNIGHT:
+            return KNIGHT_ATTACKS[sq]
+        if type_code == BISHOP:
+            return bishop_attacks(sq, occupied)
+        if type_code == ROOK:
+            return rook_attacks(sq, occupied)
+        if type_code == QUEEN:
+            return queen_attacks(sq, occupied)
+        return KING_ATTACKS[sq]
 
-        # --- 3. King attacks ---
-        king_moves = [
-            (-1, -1), (-1, 0), (-1, 1),
-            (0, -1),           (0, 1),
-            (1, -1), (1, 0), (1, 1)
-        ]
-        for dr, dc in king_moves:
-            target_r, target_c = r + dr, c + dc
-            if self.is_square_valid(target_r, target_c):
-                piece = self.get_piece_at(target_r, target_c)
-                if piece and piece.type == 'king' and piece.color == by_color:
-                    print(f"    King attack from ({target_r},{target_c}) {piece}")
-                    return True
+    def _add_attacks(self, sq, piece, occupied):
+        attacks = self._attacks_of(sq, piece, occupied)
+        self.attacks_from[sq] = attacks
+        # Add one to the count of every attacked square at once: ripple-carry over the planes
+        planes = self.attack_planes[piece.color_code]
+        carry = attacks
+        i = 0
+        while carry:
+            plane = planes[i]
+            planes[i] = plane ^ carry
+            carry &= plane
+            i += 1
 
-        # --- 4. Sliding Piece attacks (Rook/Queen, Bishop/Queen) ---
-        straight_directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        diagonal_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-
-        for dr, dc in straight_directions + diagonal_directions:
-            current_r, current_c = r + dr, c + dc
-            while self.is_square_valid(current_r, current_c):
-                piece = self.get_piece_at(current_r, current_c)
-                if piece:
-                    if piece.color == by_color:
-                        is_straight_attacker = (dr, dc) in straight_directions and (piece.type == 'rook' or piece.type == 'queen')
-                        is_diagonal_attacker = (dr, dc) in diagonal_directions and (piece.type == 'bishop' or piece.type == 'queen')
-                        if is_straight_attacker or is_diagonal_attacker:
-                            # print(f"    Sliding piece attack from ({current_r},{current_c}) {piece} in direction ({dr},{dc})")
-                            return True
-                    break # A piece, either own or opponent, blocks the line of sight for further attacks in this direction
-                current_r += dr
-                current_c += dc
-        
-        print(f"  --> is_square_attacked: ({r},{c}) NOT attacked by {by_color}")
-        return False
+    def attacked_squares(self, color):
+        """Bitboard of all squares attacked by at least one piece of 'color'."""
+        planes = self.attack_planes[COLOR_CODES[color]]
+        return planes[0] | planes[1] | planes[2] | planes[3] | planes[4]
+
+    def attack_count(self, r, c, color):
+        """Number of pieces of 'color' attacking (r, c)."""
+        sq = r * 8 + c
+        planes = self.attack_planes[COLOR_CODES[color]]
+        return sum(((plane >> sq) & 1) << i for i, plane in enumerate(planes))
+
+    def _rebuild_attack_maps(self):
+        """Computes the attack maps from scratch (after loading a position)."""
+        self.attack_planes = [[0] * ATTACK_PLANES, [0] * ATTACK_PLANES]
+        self.attacks_from = [0] * 64
+        occupied = self.occupancy[0] | self.occupancy[1]
+        bb = occupied
+        while bb:
+            lsb = bb & -bb
+            bb ^= lsb
+            sq = lsb.bit_length() - 1
+            self._add_attacks(sq, self.board_state[sq >> 3][sq & 7], occupied)
+
+    def _lift_attacks(self, changed):
+        """
+        First half of an incremental attack map update, called before the squares in 'changed'
+        change occupancy. Removes the attacks of every piece whose attack set can change: the pieces
+        on those squares and the sliders whose rays reach them. Returns the bitboard of those sliders
+        that stand elsewhere, for _restore_attacks to add back afterwards.
+        """
+        white, black = self.bitboards
+        sliders = (white[BISHOP] | white[ROOK] | white[QUEEN] |
+                   black[BISHOP] | black[ROOK] | black[QUEEN]) & ~changed
+        attacks_from = self.attacks_from
+        affected = 0
+        while sliders:
+            lsb = sliders & -sliders
+            sliders ^= lsb
+            if attacks_from[lsb.bit_length() - 1] & changed:
+                affected |= lsb
+
+        board_state = self.board_state
+        attack_planes = self.attack_planes
+        bb = affected | (changed & (self.occupancy[0] | self.occupancy[1]))
+        while bb:
+            lsb = bb & -bb
+            bb ^= lsb
+            sq = lsb.bit_length() - 1
+            planes = attack_planes[board_state[sq >> 3][sq & 7].color_code]
+            # Subtract one from every square the piece attacked: ripple-borrow over the planes
+            borrow = attacks_from[sq]
+            attacks_from[sq] = 0
+            i = 0
+            while borrow:
+                plane = planes[i]
+                planes[i] = plane ^ borrow
+                borrow &= ~plane
+                i += 1
+        return affected
+
+    def _restore_attacks(self, changed, sliders):
+        """Second half of the update: adds the attacks of the pieces now on 'changed' and of 'sliders'."""
+        occupied = self.occupancy[0] | self.occupancy[1]
+        board_state = self.board_state
+        bb = sliders | (changed & occupied)
+        while bb:
+            lsb = bb & -bb
+            bb ^= lsb
+            sq = lsb.bit_length() - 1
+            self._add_attacks(sq, board_state[sq >> 3][sq & 7], occupied)
+
+    def is_square_attacked(self, r, c, by_color):
+        """
+        Checks if the square (r, c) is attacked by any piece of 'by_color'.
+        This is a lookup in the incrementally maintained attack map.
+        """
+        planes = self.attack_planes[COLOR_CODES[by_color]]
+        attacked = (planes[0] | planes[1] | planes[2] | planes[3] | planes[4]) >> (r * 8 + c) & 1
+        if BOARD_TRACE.enabled:
+            if attacked:
+                BOARD_TRACE.emit(f"({r},{c}) attacked by {self.attack_count(r, c, by_color)} {by_color} piece(s)")
+            else:
+                BOARD_TRACE.emit(f"({r},{c}) NOT attacked by {by_color}")
+        return bool(attacked)
 
     def is_king_in_check(self, color):
         king_r, king_c = self.king_position[color]
         opponent_color = 'black' if color == 'white' else 'white'
-        print(f"\nChecking if {color}'s King at ({king_r},{king_c}) is in check from {opponent_color}...")
+        if BOARD_TRACE.enabled:
+            BOARD_TRACE.emit(f"Checking if {color}'s King at ({king_r},{king_c}) is in check from {opponent_color}")
         return self.is_square_attacked(king_r, king_c, opponent_color)
 
     def generate_pseudo_legal_moves(self):
         moves = []
-        for r in range(8):
-            for c in range(8):
-                piece = self.get_piece_at(r, c)
-                if piece and piece.color == self.turn:
-                    if piece.type == 'pawn':
-                        moves.extend(self._get_pawn_pseudo_moves(r, c, piece))
-                    elif piece.type == 'knight':
-                        moves.extend(self._get_knight_pseudo_moves(r, c, piece))
-                    elif piece.type == 'bishop':
-                        moves.extend(self._get_bishop_pseudo_moves(r, c, piece))
-                    elif piece.type == 'rook':
-                        moves.extend(self._get_rook_pseudo_moves(r, c, piece))
-                    elif piece.type == 'queen':
-                        moves.extend(self._get_queen_pseudo_moves(r, c, piece))
-                    elif piece.type == 'king':
-                        moves.extend(self._get_king_pseudo_moves(r, c, piece))
+        pieces = self.bitboards[COLOR_CODES[self.turn]]
+        generators = (
+            self._get_pawn_pseudo_moves, self._get_knight_pseudo_moves,
+            self._get_bishop_pseudo_moves, self._get_rook_pseudo_moves,
+            self._get_queen_pseudo_moves, self._get_king_pseudo_moves,
+        )
+        # Walk the set bits of each piece bitboard instead of scanning all 64 squares
+        for piece_idx, generator in enumerate(generators):
+            bb = pieces[piece_idx]
+            while bb:
+                lsb = bb & -bb
+                bb ^= lsb
+                r, c = divmod(lsb.bit_length() - 1, 8)
+                moves.extend(generator(r, c, self.board_state[r][c]))
+        return moves
+
+    def _moves_to_targets(self, r, c, targets):
+        """Turns a bitboard of destination squares for the piece on (r, c) into Move objects."""
+        moves = []
+        enemies = self.occupancy[1 - COLOR_CODES[self.turn]]
+        from_sq = r * 8 + c
+        from_code = Move.from_code
+        while targets:
+            lsb = targets & -targets
+            targets ^= lsb
+            code = from_sq | ((lsb.bit_length() - 1) << TO_SHIFT)
+            if lsb & enemies:
+                code |= FLAG_CAPTURE
+            moves.append(from_code(code))
         return moves
 
     def _get_pawn_pseudo_moves(self, r, c, pawn):
         moves = []
-        direction = -1 if pawn.color == 'white' else 1
-        start_rank = 6 if pawn.color == 'white' else 1
-        promotion_rank = 0 if pawn.color == 'white' else 7
-        promotion_pieces = ['Q', 'R', 'B', 'N']
+        color_idx = pawn.color_code
+        direction = -1 if color_idx == WHITE else 1
+        start_rank = 6 if color_idx == WHITE else 1
+        promotion_rank = 0 if color_idx == WHITE else 7
+        promotion_codes = (QUEEN, ROOK, BISHOP, KNIGHT)
+        occupied = self.occupancy[0] | self.occupancy[1]
+        from_sq = r * 8 + c
+        from_code = Move.from_code
 
         # --- 1. Single Pawn Push ---
         target_r = r + direction
-        if self.is_square_valid(target_r, c) and self.is_square_empty(target_r, c):
+        target_sq = target_r * 8 + c
+        if 0 <= target_r < 8 and not occupied & (1 << target_sq):
             if target_r == promotion_rank:
-                for promo_p in promotion_pieces:
-                    moves.append(Move((r, c), (target_r, c), promotion_piece=promo_p))
+                for promo in promotion_codes:
+                    moves.append(from_code(encode_move(from_sq, target_sq, promo)))
             else:
-                moves.append(Move((r, c), (target_r, c)))
+                moves.append(from_code(encode_move(from_sq, target_sq)))
 
-        # --- 2. Double Pawn Push ---
-        if r == start_rank:
-            double_target_r = r + 2 * direction
-            if self.is_square_valid(target_r, c) and self.is_square_empty(target_r, c) and \
-               self.is_square_valid(double_target_r, c) and self.is_square_empty(double_target_r, c):
-                moves.append(Move((r, c), (double_target_r, c)))
+            # --- 2. Double Pawn Push ---
+            if r == start_rank:
+                double_target_sq = target_sq + 8 * direction
+                if not occupied & (1 << double_target_sq):
+                    moves.append(from_code(encode_move(from_sq, double_target_sq)))
 
         # --- 3. Captures ---
-        for dc in [-1, 1]:
-            target_r, target_c = r + direction, c + dc
-            if self.is_square_valid(target_r, target_c):
-                target_piece = self.get_piece_at(target_r, target_c)
-                if target_piece and target_piece.color != pawn.color:
-                    if target_r == promotion_rank:
-                        for promo_p in promotion_pieces:
-                            moves.append(Move((r, c), (target_r, target_c), promotion_piece=promo_p, is_capture=True, captured_piece=target_piece))
-                    else:
-                        moves.append(Move((r, c), (target_r, target_c), is_capture=True, captured_piece=target_piece))
+        targets = PAWN_ATTACKS[color_idx][from_sq] & self.occupancy[1 - color_idx]
+        while targets:
+            lsb = targets & -targets
+            targets ^= lsb
+            target_sq = lsb.bit_length() - 1
+            if target_sq >> 3 == promotion_rank:
+                for promo in promotion_codes:
+                    moves.append(from_code(encode_move(from_sq, target_sq, promo, FLAG_CAPTURE)))
+            else:
+                moves.append(from_code(encode_move(from_sq, target_sq, 0, FLAG_CAPTURE)))
 
         # --- 4. En Passant ---
         if self.en_passant_target:
             ep_r, ep_c = self.en_passant_target
             if ep_r == r + direction and abs(ep_c - c) == 1:
-                captured_pawn_row = r
-                captured_pawn_col = ep_c
-                captured_piece_obj = self.get_piece_at(captured_pawn_row, captured_pawn_col)
-                
-                if captured_piece_obj and captured_piece_obj.type == 'pawn' and captured_piece_obj.color != pawn.color:
-                    moves.append(Move((r, c), self.en_passant_target, is_en_passant=True, is_capture=True, captured_piece=captured_piece_obj))
+                captured_piece_obj = self.board_state[r][ep_c]
+                if captured_piece_obj and captured_piece_obj.type_code == PAWN and captured_piece_obj.color_code != color_idx:
+                    moves.append(from_code(encode_move(from_sq, ep_r * 8 + ep_c, 0, FLAG_CAPTURE | FLAG_EN_PASSANT)))
 
         return moves
 
     def _get_knight_pseudo_moves(self, r, c, piece):
-        moves = []
-        knight_deltas = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
-        for dr, dc in knight_deltas:
-            new_r, new_c = r + dr, c + dc
-            if self.is_square_valid(new_r, new_c):
-                target_piece = self.get_piece_at(new_r, new_c)
-                if target_piece is None:
-                    moves.append(Move((r, c), (new_r, new_c)))
-                elif target_piece.color != piece.color:
-                    moves.append(Move((r, c), (new_r, new_c), is_capture=True, captured_piece=target_piece))
-        return moves
+        own = self.occupancy[piece.color_code]
+        return self._moves_to_targets(r, c, KNIGHT_ATTACKS[r * 8 + c] & ~own)
 
     def _get_bishop_pseudo_moves(self, r, c, piece):
-        moves = []
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)] # Diagonals
-        for dr, dc in directions:
-            current_r, current_c = r + dr, c + dc
-            while self.is_square_valid(current_r, current_c):
-                target_piece = self.get_piece_at(current_r, current_c)
-                if target_piece is None:
-                    moves.append(Move((r, c), (current_r, current_c)))
-                elif target_piece.color != piece.color:
-                    moves.append(Move((r, c), (current_r, current_c), is_capture=True, captured_piece=target_piece))
-                    break
-                else:
-                    break
-                current_r += dr
-                current_c += dc
-        return moves
+        own = self.occupancy[piece.color_code]
+        occupied = self.occupancy[0] | self.occupancy[1]
+        return self._moves_to_targets(r, c, bishop_attacks(r * 8 + c, occupied) & ~own)
 
     def _get_rook_pseudo_moves(self, r, c, piece):
-        moves = []
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)] # Straight
-        for dr, dc in directions:
-            current_r, current_c = r + dr, c + dc
-            while self.is_square_valid(current_r, current_c):
-                target_piece = self.get_piece_at(current_r, current_c)
-                if target_piece is None:
-                    moves.append(Move((r, c), (current_r, current_c)))
-                elif target_piece.color != piece.color:
-                    moves.append(Move((r, c), (current_r, current_c), is_capture=True, captured_piece=target_piece))
-                    break
-                else:
-                    break
-                current_r += dr
-                current_c += dc
-        return moves
+        own = self.occupancy[piece.color_code]
+        occupied = self.occupancy[0] | self.occupancy[1]
+        return self._moves_to_targets(r, c, rook_attacks(r * 8 + c, occupied) & ~own)
 
     def _get_queen_pseudo_moves(self, r, c, piece):
-        moves = self._get_rook_pseudo_moves(r, c, piece)
-        moves.extend(self._get_bishop_pseudo_moves(r, c, piece))
-        return moves
+        own = self.occupancy[piece.color_code]
+        occupied = self.occupancy[0] | self.occupancy[1]
+        return self._moves_to_targets(r, c, queen_attacks(r * 8 + c, occupied) & ~own)
 
     def _get_king_pseudo_moves(self, r, c, piece):
         """Generates pseudo-legal moves for a king at (r, c)."""
-        moves = []
-        king_deltas = [
-            (-1, -1), (-1, 0), (-1, 1),
-            (0, -1),           (0, 1),
-            (1, -1), (1, 0), (1, 1)
-        ]
-        
-        for dr, dc in king_deltas:
-            new_r, new_c = r + dr, c + dc
-            if self.is_square_valid(new_r, new_c):
-                target_piece = self.get_piece_at(new_r, new_c)
-                
-                if target_piece is None:
-                    moves.append(Move((r, c), (new_r, new_c)))
-                elif target_piece.color != piece.color:
-                    # Addressed King-on-King issue here: A king cannot capture another king.
-                    if target_piece.type == 'king':
-                        pass # Do not add this move, as a king cannot capture another king.
-                    else:
-                        moves.append(Move((r, c), (new_r, new_c), is_capture=True, captured_piece=target_piece))
-        
+        color_idx = piece.color_code
+        # A king can never capture the other king, so that square is excluded up front.
+        targets = KING_ATTACKS[r * 8 + c] & ~self.occupancy[color_idx] & ~self.bitboards[1 - color_idx][KING]
+        moves = self._moves_to_targets(r, c, targets)
+
         # --- Castling Pseudo-Moves ---
         king_color = piece.color
         king_start_row = 7 if king_color == 'white' else 0
+        own_rooks = self.bitboards[color_idx][ROOK]
+        occupied = self.occupancy[0] | self.occupancy[1]
+        row_base = king_start_row * 8
         
         if r == king_start_row and c == 4: # King is on its starting square
             # Kingside Castling
             if (king_color == 'white' and self.castling_rights['K']) or \
                (king_color == 'black' and self.castling_rights['k']):
-                if self.get_piece_at(king_start_row, 5) is None and \
-                   self.get_piece_at(king_start_row, 6) is None:
-                    rook_at_h = self.get_piece_at(king_start_row, 7)
-                    if rook_at_h and rook_at_h.type == 'rook' and rook_at_h.color == king_color:
-                        moves.append(Move((r,c), (king_start_row, 6), is_castling=True))
+                if not occupied & (0b11 << (row_base + 5)) and own_rooks & (1 << (row_base + 7)):
+                    moves.append(Move.from_code(encode_move(row_base + 4, row_base + 6, 0, FLAG_CASTLING)))
 
             # Queenside Castling
             if (king_color == 'white' and self.castling_rights['Q']) or \
                (king_color == 'black' and self.castling_rights['q']):
-                if self.get_piece_at(king_start_row, 1) is None and \
-                   self.get_piece_at(king_start_row, 2) is None and \
-                   self.get_piece_at(king_start_row, 3) is None:
-                    rook_at_a = self.get_piece_at(king_start_row, 0)
-                    if rook_at_a and rook_at_a.type == 'rook' and rook_at_a.color == king_color:
-                        moves.append(Move((r,c), (king_start_row, 2), is_castling=True))
+                if not occupied & (0b111 << (row_base + 1)) and own_rooks & (1 << row_base):
+                    moves.append(Move.from_code(encode_move(row_base + 4, row_base + 2, 0, FLAG_CASTLING)))
         
         return moves
 
 
+    def _attackers_to(self, sq, by_color_code, occupied):
+        """Bitboard of the pieces of by_color_code attacking sq, with sliders blocked by 'occupied'."""
+        pieces = self.bitboards[by_color_code]
+        queens = pieces[QUEEN]
+        return ((PAWN_ATTACKS[1 - by_color_code][sq] & pieces[PAWN]) |
+                (KNIGHT_ATTACKS[sq] & pieces[KNIGHT]) |
+                (KING_ATTACKS[sq] & pieces[KING]) |
+                (bishop_attacks(sq, occupied) & (pieces[BISHOP] | queens)) |
+                (rook_attacks(sq, occupied) & (pieces[ROOK] | queens)))
+
+    def _pinned_pieces(self, king_sq, color_code, occupied):
+        """
+        Finds the pieces of color_code pinned against their king.
+        Returns (pinned bitboard, {pinned square: squares it may still move to}).
+        """
+        enemy_pieces = self.bitboards[1 - color_code]
+        enemies = self.occupancy[1 - color_code]
+        own = self.occupancy[color_code]
+        # Enemy sliders that would see the king if our own pieces were not in the way
+        snipers = ((rook_attacks(king_sq, enemies) & (enemy_pieces[ROOK] | enemy_pieces[QUEEN])) |
+                   (bishop_attacks(king_sq, enemies) & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN])))
+        pinned = 0
+        pin_rays = {}
+        between_king = BETWEEN[king_sq]
+        while snipers:
+            sniper = snipers & -snipers
+            snipers ^= sniper
+            between = between_king[sniper.bit_length() - 1]
+            blockers = between & occupied
+            # Exactly one piece in between, and it is ours: it is pinned to the line
+            if blockers & own and not blockers & (blockers - 1):
+                pinned |= blockers
+                pin_rays[blockers.bit_length() - 1] = between | sniper
+        return pinned, pin_rays
+
     def generate_legal_moves(self):
-        pseudo_legal_moves = self.generate_pseudo_legal_moves()
-        legal_moves = []
-        current_player_color = self.turn
-        
-        # print(f"\n--- Debugging {current_player_color} legal moves ---")
-        # print(f"Original Board FEN: {self.to_fen()}")
-        # self.display()
+        """
+        Generates all legal moves for the side to move without playing any of them.
+        Checkers and pinned pieces are computed once per position: in check only evasions are
+        generated, pinned pieces stay on their pin ray, and en passant and castling are
+        validated directly against the attack tables.
+        """
+        return self._generate_legal(True, True, ALL_SQUARES)
 
-        for i, move in enumerate(pseudo_legal_moves):
-            # print(f"\nAttempting to validate pseudo-legal move {i+1}: {move}")
-            temp_board_for_check = self._copy()
-            
-            # print(f"Board state before make_move on temp_board (FEN: {temp_board_for_check.to_fen()}):")
-            # temp_board_for_check.display()
-            
-            temp_board_for_check.make_move(move, is_simulated=True) 
-            
-            # print(f"Board state AFTER make_move on temp_board (FEN: {temp_board_for_check.to_fen()}):")
-            # temp_board_for_check.display()
-            
-            king_in_check_after_move = temp_board_for_check.is_king_in_check(current_player_color)
-            # print(f"Is {current_player_color}'s King in check after {move}? {king_in_check_after_move}")
-
-            if not king_in_check_after_move:
-                # Special check for castling: the squares the king moves through cannot be attacked
-                if move.is_castling:
-                    path_clear = True
-                    row = move.from_square[0] # King's starting row
-                    opponent_color = 'black' if current_player_color == 'white' else 'white'
-
-                    # Check squares the king passes through (and the destination square)
-                    if move.to_square[1] == 6: # Kingside castling (e.g., e1-g1 for white)
-                        if self.is_square_attacked(row, 5, opponent_color) or \
-                           self.is_square_attacked(row, 6, opponent_color):
-                            path_clear = False
-                    elif move.to_square[1] == 2: # Queenside castling (e.g., e1-c1 for white)
-                        if self.is_square_attacked(row, 3, opponent_color) or \
-                           self.is_square_attacked(row, 2, opponent_color):
-                            path_clear = False
-                    
-                    if path_clear:
-                        legal_moves.append(move)
-                        # print(f"  --> Move {move} ADDED (Castling)")
+    def generate_legal_captures(self):
+        """Legal captures (en passant included) and promotions: the moves that change material."""
+        return self._generate_legal(True, False, ALL_SQUARES)
+
+    def generate_legal_quiet_moves(self):
+        """Legal moves that neither capture nor promote, castling included."""
+        return self._generate_legal(False, True, ALL_SQUARES)
+
+    def is_legal_move(self, move):
+        """
+        True if 'move' is legal here, flags included, so a move remembered from another position
+        (a hash or killer move) is only accepted if it means the same thing in this one.
+        Only the moves of the piece on the move's from-square are generated.
+        """
+        code = move.code
+        return any(legal.code == code for legal in self._generate_legal(True, True, 1 << (code & SQUARE_MASK)))
+
+    def _generate_legal(self, captures, quiets, from_mask):
+        """
+        The legal move generator behind the public generate_* methods.
+        captures / quiets select the capture-and-promotion and the quiet move sets;
+        from_mask restricts generation to pieces standing on those squares.
+        """
+        moves = []
+        append = moves.append
+        from_code = Move.from_code
+        us = COLOR_CODES[self.turn]
+        them = 1 - us
+        pieces = self.bitboards[us]
+        own = self.occupancy[us]
+        enemies = self.occupancy[them]
+        occupied = own | enemies
+
+        king_bb = pieces[KING]
+        king_sq = king_bb.bit_length() - 1
+        planes = self.attack_planes[them]
+        enemy_attacked = planes[0] | planes[1] | planes[2] | planes[3] | planes[4]
+        checkers = self._attackers_to(king_sq, them, occupied) if enemy_attacked & king_bb else 0
+
+        if captures and quiets:
+            kind_mask = ALL_SQUARES
+        elif captures:
+            kind_mask = enemies
+        else:
+            kind_mask = ALL_SQUARES & ~enemies
+
+        # --- 1. King moves ---
+        targets = KING_ATTACKS[king_sq] & ~own & kind_mask if king_bb & from_mask else 0
+        if checkers:
+            # A checking slider also covers the squares behind the king on its line, which the
+            # attack map cannot see while the king blocks the ray: test with the king lifted off
+            occupied_without_king = occupied ^ king_bb
+            while targets:
+                lsb = targets & -targets
+                targets ^= lsb
+                to_sq = lsb.bit_length() - 1
+                if not self._attackers_to(to_sq, them, occupied_without_king):
+                    append(from_code(king_sq | (to_sq << TO_SHIFT) | (FLAG_CAPTURE if lsb & enemies else 0)))
+        else:
+            self._append_targets(moves, king_sq, targets & ~enemy_attacked, enemies)
+
+        if checkers & (checkers - 1):
+            if MOVEGEN_TRACE.enabled:
+                MOVEGEN_TRACE.emit(f"{self.turn} in double check: {len(moves)} king moves")
+            return moves # Double check: only the king can move
+
+        if checkers:
+            # Single check: capture the checker or block the line between it and the king
+            target_mask = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+            if MOVEGEN_TRACE.enabled:
+                MOVEGEN_TRACE.emit(f"{self.turn} in check from square {checkers.bit_length() - 1}, generating evasions")
+        else:
+            target_mask = ALL_SQUARES
+            if quiets and king_bb & from_mask:
+                self._append_castling_moves(moves, us, king_sq, occupied, enemy_attacked)
+
+        pinned, pin_rays = self._pinned_pieces(king_sq, us, occupied)
+        allowed = ~own & target_mask & kind_mask
+
+        # --- 2. Knights (a pinned knight can never move) ---
+        bb = pieces[KNIGHT] & ~pinned & from_mask
+        while bb:
+            lsb = bb & -bb
+            bb ^= lsb
+            from_sq = lsb.bit_length() - 1
+            self._append_targets(moves, from_sq, KNIGHT_ATTACKS[from_sq] & allowed, enemies)
+
+        # --- 3. Sliders ---
+        for piece_type, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, queen_attacks)):
+            bb = pieces[piece_type] & from_mask
+            while bb:
+                lsb = bb & -bb
+                bb ^= lsb
+                from_sq = lsb.bit_length() - 1
+                targets = attacks(from_sq, occupied) & allowed
+                if lsb & pinned:
+                    targets &= pin_rays[from_sq]
+                self._append_targets(moves, from_sq, targets, enemies)
+
+        # --- 4. Pawns ---
+        push = -8 if us == WHITE else 8
+        start_row = 6 if us == WHITE else 1
+        promotion_row = 0 if us == WHITE else 7
+        pawn_attacks = PAWN_ATTACKS[us]
+        bb = pieces[PAWN] & from_mask
+        while bb:
+            lsb = bb & -bb
+            bb ^= lsb
+            from_sq = lsb.bit_length() - 1
+            targets = pawn_attacks[from_sq] & enemies if captures else 0
+            one_step = from_sq + push
+            if not occupied & (1 << one_step):
+                # Pushes to the last rank promote and belong with the captures
+                if one_step >> 3 == promotion_row:
+                    if captures:
+                        targets |= 1 << one_step
+                elif quiets:
+                    targets |= 1 << one_step
+                    if from_sq >> 3 == start_row and not occupied & (1 << (one_step + push)):
+                        targets |= 1 << (one_step + push)
+            targets &= target_mask
+            if lsb & pinned:
+                targets &= pin_rays[from_sq]
+            while targets:
+                to_bit = targets & -targets
+                targets ^= to_bit
+                to_sq = to_bit.bit_length() - 1
+                code = from_sq | (to_sq << TO_SHIFT) | (FLAG_CAPTURE if to_bit & enemies else 0)
+                if to_sq >> 3 == promotion_row:
+                    for promotion_code in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        append(from_code(code | (promotion_code << PROMOTION_SHIFT)))
                 else:
-                    legal_moves.append(move)
-                    # print(f"  --> Move {move} ADDED (Not Castling)")
-            # else:
-                # print(f"  --> Move {move} DISCARDED (King in check)")
-        return legal_moves
+                    append(from_code(code))
+
+        # --- 5. En passant ---
+        if captures and self.en_passant_target:
+            ep_r, ep_c = self.en_passant_target
+            ep_sq = ep_r * 8 + ep_c
+            captured_bit = 1 << (ep_sq - push)
+            if captured_bit & self.bitboards[them][PAWN]:
+                candidates = PAWN_ATTACKS[them][ep_sq] & pieces[PAWN] & from_mask
+                while candidates:
+                    lsb = candidates & -candidates
+                    candidates ^= lsb
+                    # Two pawns leave the capture rank at once, so pins and checks are tested on
+                    # the resulting occupancy instead of through pin rays.
+                    occupied_after = (occupied ^ lsb ^ captured_bit) | (1 << ep_sq)
+                    if not self._attackers_to(king_sq, them, occupied_after) & ~captured_bit:
+                        append(from_code(encode_move(lsb.bit_length() - 1, ep_sq, 0, FLAG_CAPTURE | FLAG_EN_PASSANT)))
+
+        return moves
+
+    def _append_targets(self, moves, from_sq, targets, enemies):
+        from_code = Move.from_code
+        while targets:
+            lsb = targets & -targets
+            targets ^= lsb
+            moves.append(from_code(from_sq | ((lsb.bit_length() - 1) << TO_SHIFT) | (FLAG_CAPTURE if lsb & enemies else 0)))
+
+    def _append_castling_moves(self, moves, color_code, king_sq, occupied, enemy_attacked):
+        """Adds castling moves; the caller guarantees the king is not in check."""
+        row_base = 56 if color_code == WHITE else 0
+        if king_sq != row_base + 4:
+            return
+        kingside, queenside = ('K', 'Q') if color_code == WHITE else ('k', 'q')
+        rooks = self.bitboards[color_code][ROOK]
+        # The king may not pass through or land on an attacked square
+        if self.castling_rights[kingside] and rooks & (1 << (row_base + 7)) and \
+           not occupied & (0b11 << (row_base + 5)) and \
+           not enemy_attacked & (0b11 << (row_base + 5)):
+            moves.append(Move.from_code(encode_move(king_sq, row_base + 6, 0, FLAG_CASTLING)))
+        if self.castling_rights[queenside] and rooks & (1 << row_base) and \
+           not occupied & (0b111 << (row_base + 1)) and \
+           not enemy_attacked & (0b11 << (row_base + 2)):
+            moves.append(Move.from_code(encode_move(king_sq, row_base + 2, 0, FLAG_CASTLING)))
+
+    @staticmethod
+    def _changed_squares(code):
+        """Bitboard of the squares whose occupancy a move changes (rook and en passant squares included)."""
+        from_sq = code & SQUARE_MASK
+        to_sq = (code >> TO_SHIFT) & SQUARE_MASK
+        changed = (1 << from_sq) | (1 << to_sq)
+        if code & FLAG_EN_PASSANT:
+            changed |= 1 << ((from_sq & ~7) | (to_sq & 7))
+        elif code & FLAG_CASTLING:
+            row_base = from_sq & ~7
+            if to_sq & 7 == 6:
+                changed |= (1 << (row_base + 7)) | (1 << (row_base + 5))
+            else:
+                changed |= (1 << row_base) | (1 << (row_base + 3))
+        return changed
 
     def make_move(self, move, is_simulated=False):
-        piece_moving = self.get_piece_at(move.from_square[0], move.from_square[1])
+        code = move.code
+        from_sq = code & SQUARE_MASK
+        to_sq = (code >> TO_SHIFT) & SQUARE_MASK
+        from_r, from_c = from_sq >> 3, from_sq & 7
+        to_r, to_c = to_sq >> 3, to_sq & 7
+
+        piece_moving = self.board_state[from_r][from_c]
         if not piece_moving:
-            raise ValueError(f"No piece found at {move.from_square} to move!")
+            raise ValueError(f"No piece found at {(from_r, from_c)} to move!")
+
+        changed = self._changed_squares(code)
+        lifted_sliders = self._lift_attacks(changed)
+        self.key_history.append(self.zobrist_key)
+        # Piece keys are updated by _put_piece / _remove_piece; the rest is swapped out and back in
+        self.zobrist_key ^= self._state_key()
 
-        if move.is_capture:
-            if move.is_en_passant:
-                captured_pawn_row = move.from_square[0]
-                captured_pawn_col = move.to_square[1]
-                self.board_state[captured_pawn_row][captured_pawn_col] = None
+        captured_piece = None
+        if code & FLAG_CAPTURE:
+            if code & FLAG_EN_PASSANT:
+                captured_piece = self._remove_piece(from_r, to_c)
             else:
-                self.board_state[move.to_square[0]][move.to_square[1]] = None
+                captured_piece = self._remove_piece(to_r, to_c)
+
+        # Everything unmake_move needs that cannot be recomputed from the move itself
+        self.undo_stack.append((
+            captured_piece,
+            self.castling_rights.copy(),
+            self.en_passant_target,
+            self.halfmove_clock,
+            self.fullmove_number,
+            self.king_position.copy(),
+        ))
+        if captured_piece is not None:
             self.halfmove_clock = 0
+            self.material_key -= MATERIAL_UNITS[captured_piece.index]
 
-        self.board_state[move.to_square[0]][move.to_square[1]] = piece_moving
-        self.board_state[move.from_square[0]][move.from_square[1]] = None
+        self._remove_piece(from_r, from_c)
+        self._put_piece(to_r, to_c, piece_moving)
 
-        if piece_moving.type == 'king':
-            self.king_position[piece_moving.color] = move.to_square
-            if piece_moving.color == 'white':
+        piece_type = piece_moving.type_code
+        if piece_type == KING:
+            self.king_position[piece_moving.color] = (to_r, to_c)
+            if piece_moving.color_code == WHITE:
                 self.castling_rights['K'] = False
                 self.castling_rights['Q'] = False
             else:
                 self.castling_rights['k'] = False
                 self.castling_rights['q'] = False
         
-        if piece_moving.type == 'rook':
-            if piece_moving.color == 'white':
-                if move.from_square == (7, 0) and self.castling_rights['Q']:
+        if piece_type == ROOK:
+            if piece_moving.color_code == WHITE:
+                if from_sq == 56 and self.castling_rights['Q']:   # a1
                     self.castling_rights['Q'] = False
-                elif move.from_square == (7, 7) and self.castling_rights['K']:
+                elif from_sq == 63 and self.castling_rights['K']: # h1
                     self.castling_rights['K'] = False
             else:
-                if move.from_square == (0, 0) and self.castling_rights['q']:
+                if from_sq == 0 and self.castling_rights['q']:    # a8
                     self.castling_rights['q'] = False
-                elif move.from_square == (0, 7) and self.castling_rights['k']:
+                elif from_sq == 7 and self.castling_rights['k']:  # h8
                     self.castling_rights['k'] = False
 
-        if piece_moving.type == 'pawn':
+        # Capturing a rook on its corner square also removes the opponent's right on that side
+        if captured_piece is not None and captured_piece.type_code == ROOK:
+            corner_right = CORNER_CASTLING_RIGHTS.get(to_sq)
+            if corner_right:
+                self.castling_rights[corner_right] = False
+
+        if piece_type == PAWN:
             self.halfmove_clock = 0
 
-            if abs(move.from_square[0] - move.to_square[0]) == 2:
-                ep_target_row = (move.from_square[0] + move.to_square[0]) // 2
-                self.en_passant_target = (ep_target_row, move.to_square[1])
+            if abs(from_r - to_r) == 2:
+                self.en_passant_target = ((from_r + to_r) // 2, to_c)
             else:
                 self.en_passant_target = None
 
-            if move.promotion_piece:
-                promoted_piece = Piece(
-                    {'Q': 'queen', 'R': 'rook', 'B': 'bishop', 'N': 'knight'}[move.promotion_piece],
-                    piece_moving.color
-                )
-                self.board_state[move.to_square[0]][move.to_square[1]] = promoted_piece
+            promotion_code = (code >> PROMOTION_SHIFT) & 0x7
+            if promotion_code:
+                self._remove_piece(to_r, to_c)
+                promoted = PIECES[piece_moving.color_code * 6 + promotion_code]
+                self._put_piece(to_r, to_c, promoted)
+                self.material_key += MATERIAL_UNITS[promoted.index] - MATERIAL_UNITS[piece_moving.index]
 
         else:
-            if not move.is_capture:
+            if captured_piece is None:
                 self.halfmove_clock += 1
             self.en_passant_target = None
 
-        if move.is_castling:
-            king_row = move.from_square[0]
-            if move.to_square[1] == 6:
-                rook_from = (king_row, 7)
-                rook_to = (king_row, 5)
-            elif move.to_square[1] == 2:
-                rook_from = (king_row, 0)
-                rook_to = (king_row, 3)
+        if code & FLAG_CASTLING:
+            if to_c == 6:
+                rook_from_c, rook_to_c = 7, 5
+            elif to_c == 2:
+                rook_from_c, rook_to_c = 0, 3
             else:
                 raise ValueError("Invalid castling 'to_square'")
             
-            rook_moving = self.get_piece_at(rook_from[0], rook_from[1])
-            self.board_state[rook_to[0]][rook_to[1]] = rook_moving
-            self.board_state[rook_from[0]][rook_from[1]] = None
+            rook_moving = self._remove_piece(from_r, rook_from_c)
+            self._put_piece(from_r, rook_to_c, rook_moving)
 
 
+        self._restore_attacks(changed, lifted_sliders)
+
         if self.turn == 'black' and not is_simulated:
             self.fullmove_number += 1
         
         self.turn = 'black' if self.turn == 'white' else 'white'
+        self.zobrist_key ^= self._state_key()
 
 
     def unmake_move(self, move):
-        print(f"Unmaking move {move} (Logic not implemented for full reversion)")
+        """
+        Takes back 'move', which must be the last move made on this board.
+        Restores pieces, castling rights, en passant target, clocks and king positions exactly.
+        """
+        if not self.undo_stack:
+            raise ValueError(f"Cannot unmake {move}: no moves have been made on this board.")
+        (captured_piece, castling_rights, en_passant_target,
+         halfmove_clock, fullmove_number, king_position) = self.undo_stack.pop()
+        self.key_history.pop()
+
+        self.zobrist_key ^= self._state_key()
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        code = move.code
+        from_sq = code & SQUARE_MASK
+        to_sq = (code >> TO_SHIFT) & SQUARE_MASK
+        from_r, from_c = from_sq >> 3, from_sq & 7
+        to_r, to_c = to_sq >> 3, to_sq & 7
+        changed = self._changed_squares(code)
+        lifted_sliders = self._lift_attacks(changed)
+
+        if code & FLAG_CASTLING:
+            if to_c == 6:
+                rook_from_c, rook_to_c = 7, 5
+            else:
+                rook_from_c, rook_to_c = 0, 3
+            rook = self._remove_piece(from_r, rook_to_c)
+            self._put_piece(from_r, rook_from_c, rook)
+
+        piece_moved = self._remove_piece(to_r, to_c)
+        if code & PROMOTION_MASK:
+            pawn = PIECES[piece_moved.color_code * 6 + PAWN]
+            self.material_key += MATERIAL_UNITS[pawn.index] - MATERIAL_UNITS[piece_moved.index]
+            piece_moved = pawn
+        self._put_piece(from_r, from_c, piece_moved)
+
+        if captured_piece is not None:
+            self.material_key += MATERIAL_UNITS[captured_piece.index]
+            if code & FLAG_EN_PASSANT:
+                self._put_piece(from_r, to_c, captured_piece)
+            else:
+                self._put_piece(to_r, to_c, captured_piece)
+
+        self._restore_attacks(changed, lifted_sliders)
+
+        self.castling_rights = castling_rights
+        self.en_passant_target = en_passant_target
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self.king_position = king_position
+        self.zobrist_key ^= self._state_key()
+
+    def make_null_move(self):
+        """
+        Passes the turn without moving a piece, for the search's null-move pruning.
+        Not a legal chess move: the side to move must not be in check. Undo with unmake_null_move.
+        """
+        self.key_history.append(self.zobrist_key)
+        self.zobrist_key ^= self._state_key()
+        self.undo_stack.append((
+            None,
+            self.castling_rights,
+            self.en_passant_target,
+            self.halfmove_clock,
+            self.fullmove_number,
+            self.king_position,
+        ))
+        self.en_passant_target = None
+        # No position before a pass can recur in the searched line
+        self.halfmove_clock = 0
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        self.zobrist_key ^= self._state_key()
+
+    def unmake_null_move(self):
+        """Takes back make_null_move, which must be the last move made on this board."""
+        _, _, en_passant_target, halfmove_clock, _, _ = self.undo_stack.pop()
+        self.key_history.pop()
+        self.zobrist_key ^= self._state_key()
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        self.en_passant_target = en_passant_target
+        self.halfmove_clock = halfmove_clock
+        self.zobrist_key ^= self._state_key()
+
+    def perft(self, depth, cache=None):
+        """
+        Counts the leaf nodes of the legal move tree 'depth' plies deep.
+        The last ply is counted from the legal move list without playing the moves (bulk counting).
+        Pass a dict as 'cache' to reuse the counts of positions reached by transposition.
+        """
+        if depth <= 0:
+            return 1
+        if depth == 1:
+            return len(self.generate_legal_moves())
+
+        # Look the position up before generating its moves: a hit needs no move generation at all
+        if cache is not None:
+            key = (self.zobrist_key, depth)
+            nodes = cache.get(key)
+            if nodes is not None:
+                return nodes
+
+        nodes = 0
+        for move in self.generate_legal_moves():
+            self.make_move(move, is_simulated=True)
+            nodes += self.perft(depth - 1, cache)
+            self.unmake_move(move)
+
+        if cache is not None:
+            cache[key] = nodes
+        return nodes
+
+    def divide(self, depth, cache=None):
+        """
+        Perft split by root move: returns {uci move: leaf count} for every legal move.
+        Comparing the result with a reference engine pinpoints which subtree is wrong.
+        """
+        counts = {}
+        for move in self.generate_legal_moves():
+            self.make_move(move, is_simulated=True)
+            counts[move.to_uci()] = self.perft(depth - 1, cache)
+            self.unmake_move(move)
+        return counts
 
     def is_checkmate(self):
         return self.is_king_in_check(self.turn) and not self.generate_legal_moves()
@@ -555,9 +1172,50 @@ class Board:
     def is_stalemate(self):
         return not self.is_king_in_check(self.turn) and not self.generate_legal_moves()
 
+    def is_repetition(self, count=1):
+        """
+        True if the current position has occurred at least 'count' times before.
+        Only the last halfmove_clock plies are searched - a capture or pawn move in between makes
+        a repetition impossible - and only every second one, where the same side was to move.
+        """
+        key = self.zobrist_key
+        history = self.key_history
+        limit = min(self.halfmove_clock, len(history))
+        # history[-i] is the position i plies ago; the earliest possible repetition is 4 plies back
+        for i in range(4, limit + 1, 2):
+            if history[-i] == key:
+                count -= 1
+                if count == 0:
+                    return True
+        return False
+
+    def is_search_repetition(self, ply):
+        """
+        True if a search 'ply' plies from its root should score this position as a draw by repetition.
+        A repetition inside the searched line (at most 'ply' plies back) can be forced to repeat again,
+        so one earlier occurrence is enough. Positions played before the root are the game's history:
+        repeating one of those is only a draw once it is a real threefold repetition.
+        """
+        key = self.zobrist_key
+        history = self.key_history
+        limit = min(self.halfmove_clock, len(history))
+        earlier = 0
+        for i in range(4, limit + 1, 2):
+            if history[-i] == key:
+                if i <= ply:
+                    return True
+                earlier += 1
+                if earlier == 2:
+                    return True
+        return False
+
     def is_draw(self):
         if self.halfmove_clock >= 100:
             return True
+        if self.is_repetition(2): # Threefold repetition
+            return True
+        if is_insufficient_material(self):
+            return True
         return False
 
     def display(self):
@@ -0,0 +1,153 @@
+# endgame.py
+# Material signatures and the endgame recognizer table.
+#
+# Board.material_key packs the number of pieces of each kind into one integer, 4 bits per kind
+# in piece index order (white pawn ... white king, black pawn ... black king), so a whole class of
+# positions such as "king and rook against a lone king" is a single dict lookup away.
+from piece import PIECES_BY_SYMBOL, PIECE_VALUES, WHITE, BLACK, BISHOP, KING
+
+MATERIAL_SHIFT = 4
+# The amount one piece of each kind adds to a material key, indexed by piece.index
+MATERIAL_UNITS = tuple(1 << (index * MATERIAL_SHIFT) for index in range(12))
+
+# Added to the material balance in recognized won endings so the search prefers simplifying into them
+KNOWN_WIN = 1000
+
+
+def material_key(white, black):
+    """The material key for the given piece letters, e.g. material_key('KR', 'K')."""
+    key = 0
+    for symbol in white.upper() + black.lower():
+        key += MATERIAL_UNITS[PIECES_BY_SYMBOL[symbol].index]
+    return key
+
+
+def _both_ways(strong, weak):
+    """The keys of an ending with the strong side playing white and black: ((key, WHITE), (key, BLACK))."""
+    return ((material_key(strong, weak), WHITE), (material_key(weak, strong), BLACK))
+
+
+# Positions where neither side can possibly checkmate
+INSUFFICIENT_MATERIAL = frozenset(
+    [material_key('K', 'K')]
+    + [key for key, _ in _both_ways('KN', 'K')]
+    + [key for key, _ in _both_ways('KB', 'K')]
+)
+_KB_VS_KB = material_key('KB', 'KB')
+
+# Endings where mate is possible but cannot be forced
+DRAWN_ENDINGS = frozenset(key for key, _ in _both_ways('KNN', 'K'))
+
+
+def _square_color(sq):
+    return ((sq >> 3) + (sq & 7)) & 1
+
+
+def is_insufficient_material(board):
+    """True if no sequence of legal moves can end in checkmate (K vs K, KB vs K, KN vs K, same-colored bishops)."""
+    key = board.material_key
+    if key in INSUFFICIENT_MATERIAL:
+        return True
+    if key == _KB_VS_KB:
+        white_bishop = board.bitboards[WHITE][BISHOP]
+        black_bishop = board.bitboards[BLACK][BISHOP]
+        return _square_color(white_bishop.bit_length() - 1) == _square_color(black_bishop.bit_length() - 1)
+    return False
+
+
+def is_recognized_draw(board):
+    """True for positions the recognizers know to be drawn: insufficient material and drawn endings."""
+    return board.material_key in DRAWN_ENDINGS or is_insufficient_material(board)
+
+
+def _center_distance(sq):
+    """Manhattan distance from sq to the nearest of the four center squares (0-6)."""
+    row, col = sq >> 3, sq & 7
+    return max(3 - row, row - 4) + max(3 - col, col - 4)
+
+
+def _king_distance(a, b):
+    return abs((a >> 3) - (b >> 3)) + abs((a & 7) - (b & 7))
+
+
+def _piece_count(key, color_code, type_code):
+    """The number of pieces of one kind in a material key."""
+    return (key >> ((color_code * 6 + type_code) * MATERIAL_SHIFT)) & ((1 << MATERIAL_SHIFT) - 1)
+
+
+def _material_balance(board, strong):
+    """Material of the strong side minus the weak side's, in centipawns."""
+    key = board.material_key
+    balance = 0
+    for type_code in range(KING):
+        balance += 100 * PIECE_VALUES[type_code] * (
+            _piece_count(key, strong, type_code) - _piece_count(key, 1 - strong, type_code))
+    return balance
+
+
+def _mop_up(board, strong, corner_distance=None):
+    """
+    Scores a won ending against a lone king: material, plus driving the weak king to the edge
+    (or, with corner_distance, to the right corner) and bringing the strong king closer.
+    """
+    weak = 1 - strong
+    weak_king = board.bitboards[weak][KING].bit_length() - 1
+    strong_king = board.bitboards[strong][KING].bit_length() - 1
+
+    # A lone king with no moves is stalemated unless in check; leave mates to the search
+    if board.turn == ('white', 'black')[weak] and not board.is_king_in_check(board.turn) \
+            and not board.generate_legal_moves():
+        return 0
+
+    edge = corner_distance(weak_king) if corner_distance else _center_distance(weak_king)
+    score = KNOWN_WIN + _material_balance(board, strong) + 20 * edge + 10 * (14 - _king_distance(strong_king, weak_king))
+    return score if strong == WHITE else -score
+
+
+def _draw(board, strong):
+    return 0
+
+
+def _kbbk(board, strong):
+    bishops = board.bitboards[strong][BISHOP]
+    first = bishops & -bishops
+    second = bishops ^ first
+    # Two bishops on the same square color cannot force mate
+    if _square_color(first.bit_length() - 1) == _square_color(second.bit_length() - 1):
+        return 0
+    return _mop_up(board, strong)
+
+
+def _kbnk(board, strong):
+    # Mate is only possible in a corner of the bishop's square color
+    bishop_color = _square_color(board.bitboards[strong][BISHOP].bit_length() - 1)
+    corners = [sq for sq in (0, 7, 56, 63) if _square_color(sq) == bishop_color]
+
+    def corner_distance(sq):
+        # Larger is better for the strong side, like _center_distance
+        return 14 - min(_king_distance(sq, corner) for corner in corners)
+
+    return _mop_up(board, strong, corner_distance)
+
+
+def _kxk(board, strong):
+    return _mop_up(board, strong)
+
+
+# material key -> (recognizer, strong side color code)
+# A recognizer returns a score from white's perspective, or None to fall back to the normal evaluation.
+ENDGAME_RECOGNIZERS = {}
+for _key in INSUFFICIENT_MATERIAL | DRAWN_ENDINGS:
+    ENDGAME_RECOGNIZERS[_key] = (_draw, WHITE)
+for _strong, _recognizer in (('KQ', _kxk), ('KR', _kxk), ('KBB', _kbbk), ('KBN', _kbnk)):
+    for _key, _color in _both_ways(_strong, 'K'):
+        ENDGAME_RECOGNIZERS[_key] = (_recognizer, _color)
+
+
+def recognize(board):
+    """The recognizer score for the position (white's perspective), or None if it has no recognizer."""
+    entry = ENDGAME_RECOGNIZERS.get(board.material_key)
+    if entry is None:
+        return None
+    recognizer, strong = entry
+    return recognizer(board, strong)
@@ -0,0 +1,234 @@
+# epd.py
+# Streaming reader for EPD and FEN files (plain or gzip compressed).
+#
+#   for record in read_epd("suite.epd.gz"):
+#       board = record.board()
+#       print(record.id, record.best_moves)
+#
+#   # Fan parsing and per-position work out to a process pool, chunk by chunk:
+#   for count in process_epd("positions.epd", count_legal_moves, workers=8):
+#       ...
+#
+# Lines are read and parsed lazily, so files of any size are processed in constant memory.
+# Each line is either a full FEN (6 fields) or an EPD record: the first four FEN fields followed
+# by ';'-terminated operations such as  bm Nf3;  am Qxb7;  id "WAC.001";
+import concurrent.futures
+import gzip
+import itertools
+import os
+
+from board import Board
+from piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+PIECE_LETTERS = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+
+
+class EPDRecord:
+    """One position from an EPD/FEN file: its FEN and its operations (opcode -> list of operand strings)."""
+    __slots__ = ('fen', 'operations')
+
+    def __init__(self, fen, operations=None):
+        self.fen = fen
+        self.operations = operations if operations is not None else {}
+
+    def board(self):
+        return Board(fen=self.fen)
+
+    @property
+    def id(self):
+        operands = self.operations.get('id')
+        return operands[0] if operands else None
+
+    @property
+    def best_moves(self):
+        """The 'bm' operands (SAN strings); see san_to_move to resolve them on the board."""
+        return self.operations.get('bm', [])
+
+    @property
+    def avoid_moves(self):
+        """The 'am' operands (SAN strings)."""
+        return self.operations.get('am', [])
+
+    def __repr__(self):
+        return f"<EPDRecord {self.fen!r} {self.operations!r}>"
+
+
+def _parse_operations(text):
+    """Parses 'bm Nf3 Ng5; id "WAC 001";' into {'bm': ['Nf3', 'Ng5'], 'id': ['WAC 001']}."""
+    operations = {}
+    if '"' not in text:
+        # Fast path: no quoted operands, so ';' and spaces are the only separators
+        for operation in text.split(';'):
+            tokens = operation.split()
+            if tokens:
+                operations[tokens[0]] = tokens[1:]
+        return operations
+
+    tokens = []
+    token = []
+    in_quotes = False
+    for char in text:
+        if in_quotes:
+            if char == '"':
+                in_quotes = False
+                tokens.append(''.join(token))
+                token = []
+            else:
+                token.append(char)
+        elif char == '"':
+            in_quotes = True
+        elif char == ';' or char.isspace():
+            if token:
+                tokens.append(''.join(token))
+                token = []
+            if char == ';' and tokens:
+                operations[tokens[0]] = tokens[1:]
+                tokens = []
+        else:
+            token.append(char)
+    if token:
+        tokens.append(''.join(token))
+    if tokens:
+        operations[tokens[0]] = tokens[1:]
+    return operations
+
+
+def parse_epd_line(line):
+    """
+    Parses one FEN or EPD line into an EPDRecord, or returns None for blank and '#' comment lines.
+    EPD records get clocks from their 'hmvc' / 'fmvn' operations, or '0 1'.
+    """
+    line = line.strip()
+    if not line or line[0] == '#':
+        return None
+    fields = line.split(None, 6)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD/FEN line: '{line}'. Expected at least 4 fields.")
+    position = ' '.join(fields[:4])
+
+    # A FEN line has two numeric clock fields after the first four
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        rest = fields[6] if len(fields) == 7 else ''
+        operations = _parse_operations(rest) if rest else {}
+        return EPDRecord(f"{position} {fields[4]} {fields[5]}", operations)
+
+    rest = line.split(None, 4)[4] if len(fields) > 4 else ''
+    operations = _parse_operations(rest) if rest else {}
+    halfmove = operations.get('hmvc', ['0'])[0]
+    fullmove = operations.get('fmvn', ['1'])[0]
+    return EPDRecord(f"{position} {halfmove} {fullmove}", operations)
+
+
+def _open(path):
+    # gzip files are recognised by their magic bytes, whatever they are called
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _read_lines(source):
+    if isinstance(source, str):
+        with _open(source) as f:
+            yield from f
+    else:
+        yield from source
+
+
+def read_epd(source):
+    """
+    Lazily yields an EPDRecord for every position in 'source': a file path (plain or gzip)
+    or any iterable of lines, such as an open file.
+    """
+    for line in _read_lines(source):
+        record = parse_epd_line(line)
+        if record is not None:
+            yield record
+
+
+def _process_chunk(lines, func):
+    # Runs in a worker process: parse the chunk and apply func to every record
+    results = []
+    for line in lines:
+        record = parse_epd_line(line)
+        if record is not None:
+            results.append(func(record))
+    return results
+
+
+def process_epd(source, func, workers=None, chunk_size=10000):
+    """
+    Yields func(record) for every record of 'source', in file order.
+    Lines are handed to a pool of 'workers' processes in chunks of 'chunk_size' that are parsed and
+    processed there; only a few chunks are in flight at a time, so memory stays bounded.
+    'func' must be picklable (a module-level function). workers=0 runs everything in this process.
+    """
+    lines = _read_lines(source)
+    if workers == 0:
+        for line in lines:
+            record = parse_epd_line(line)
+            if record is not None:
+                yield func(record)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        max_in_flight = 2 * workers
+        pending = []
+        while True:
+            while len(pending) < max_in_flight:
+                chunk = list(itertools.islice(lines, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_process_chunk, chunk, func))
+            if not pending:
+                return
+            yield from pending.pop(0).result()
+
+
+def san_to_move(board, san):
+    """
+    Finds the legal move on 'board' written as 'san' (e.g. 'Nf3', 'exd5', 'e8=Q+', 'O-O').
+    Raises ValueError if no legal move or more than one matches.
+    """
+    text = san.rstrip('+#!?')
+    legal_moves = board.generate_legal_moves()
+
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        target_col = 6 if len(text) == 3 else 2
+        matches = [move for move in legal_moves if move.is_castling and move.to_square[1] == target_col]
+    else:
+        promotion = None
+        if '=' in text:
+            text, promotion = text.split('=')
+        elif text[-1] in 'NBRQ' and text[0].islower():
+            text, promotion = text[:-1], text[-1]
+        piece_type = PIECE_LETTERS.get(text[0], PAWN)
+        if piece_type != PAWN:
+            text = text[1:]
+        text = text.replace('x', '')
+        to_col = ord(text[-2]) - ord('a')
+        to_row = 8 - int(text[-1])
+        disambiguation = text[:-2]
+
+        matches = []
+        for move in legal_moves:
+            from_r, from_c = move.from_square
+            if move.to_square != (to_row, to_col) or move.promotion_piece != promotion:
+                continue
+            if board.board_state[from_r][from_c].type_code != piece_type:
+                continue
+            if any(not _matches_square_hint(hint, from_r, from_c) for hint in disambiguation):
+                continue
+            matches.append(move)
+
+    if len(matches) != 1:
+        raise ValueError(f"SAN move '{san}' matches {len(matches)} legal moves in {board.to_fen()}")
+    return matches[0]
+
+
+def _matches_square_hint(hint, row, col):
+    if hint.isdigit():
+        return 8 - int(hint) == row
+    return ord(hint) - ord('a') == col
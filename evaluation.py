@@ -1,4 +1,7 @@
 # evaluation.py
+from endgame import recognize
+from tracing import EVAL as EVAL_TRACE
+
 class Evaluation:
     def __init__(self):
         # Piece values (material score)
@@ -102,6 +105,13 @@ class Evaluation:
         Evaluates the given board position and returns a score.
         A positive score means White has an advantage, negative means Black.
         """
+        # Known endings (dead draws, mating a lone king) are scored from the material key alone
+        score = recognize(board)
+        if score is not None:
+            if EVAL_TRACE.enabled:
+                EVAL_TRACE.emit(f"{board.to_fen()} -> {score} (recognized ending)")
+            return score
+
         score = 0
 
         # Iterate through all squares on the board
@@ -144,4 +154,6 @@ class Evaluation:
         if board.is_draw():
             return 0 # Draw is 0 points
 
+        if EVAL_TRACE.enabled:
+            EVAL_TRACE.emit(f"{board.to_fen()} -> {score}")
         return score
\ No newline at end of file
@@ -1,6 +1,10 @@
 # game_controller.py
+import concurrent.futures
+import os
+import time
 from board import Board
 from evaluation import Evaluation
+from move import Move
 from search import Search
 # from pgn_parser import PGNParser # PGNParser is highly complex to do from scratch, keep commented for now if not implemented.
 
@@ -34,16 +38,24 @@ class GameController:
     #     #     self.board.from_fen(board_lib.fen()) # Convert python-chess board to your board
     #     return False
 
-    def get_engine_move(self, depth=3):
+    def get_engine_move(self, depth=3, movetime=None):
         """
         Calculates and returns the best move found by the engine.
+        With movetime (milliseconds) the engine deepens until the time is used, up to 'depth' if given.
         """
-        print(f"\nEngine thinking for {self.board.turn}'s turn (Depth: {depth})...")
-        best_move, best_score = self.engine.find_best_move(self.board, depth)
+        print(f"\nEngine thinking for {self.board.turn}'s turn (Depth: {depth}, Movetime: {movetime})...")
+        best_move, best_score = self.engine.find_best_move(self.board, depth, movetime=movetime)
         print(f"Engine chose: {best_move} (Score: {best_score})")
         print(f"Nodes searched: {self.engine.nodes_searched}")
+        self._print_search_stats()
         return best_move, best_score
 
+    def _print_search_stats(self):
+        stats = self.engine.stats
+        print(f"Depth {stats.depth} (selective {stats.seldepth}), {stats.nodes} + {stats.qnodes} quiescence nodes "
+              f"in {stats.time:.2f}s ({stats.nps} nps), branching factor {stats.ebf:.1f}, "
+              f"first-move cutoffs {stats.first_move_cutoff_rate:.0%}")
+
     def make_player_move(self, uci_move_str):
         """
         Makes a player's move on the board (if legal).
@@ -74,9 +86,17 @@ class GameController:
             print(f"Illegal move: {uci_move_str}. Please enter a legal UCI move.")
             return True # Continue game loop
 
-    def analyze_current_position(self, num_lines=3, depth=5):
+    def analyze_current_position(self, num_lines=3, depth=5, workers=0, timeout=None):
         """
         Analyzes the current board position and suggests the top 'num_lines' moves.
+        workers: 0 runs one MultiPV search in this process, which finds the best lines and their
+        principal variations without searching the other moves exactly; otherwise every root move
+        is searched exactly, spread over a pool of 'workers' processes (None: one per CPU) and
+        merged as they finish.
+        timeout: seconds for the whole analysis. The MultiPV search returns its last completed
+        iteration; in a pool, each move is deepened one ply at a time and keeps the score of its last
+        completed depth, marked as partial and ranked after the moves searched to full depth.
+        Moves not started by then are left out.
         """
         print(f"\nAnalyzing current position for {self.board.turn}'s turn (Depth: {depth})...")
         
@@ -85,53 +105,76 @@ class GameController:
             print("No legal moves available. Position is checkmate or stalemate.")
             return []
 
-        move_scores = []
-        # For each legal move, make it, then evaluate the resulting position
-        # from the perspective of the *opponent's best response*.
+        if workers == 0:
+            move_scores = self.engine.find_best_lines(self.board, num_lines, depth,
+                                                      movetime=timeout * 1000 if timeout is not None else None)
+            nodes = self.engine.nodes_searched
+        else:
+            # A wall-clock deadline, so that worker processes can share it
+            deadline = time.time() + timeout if timeout is not None else None
+            move_scores, nodes = self._analyze_moves_in_pool(legal_moves, depth, deadline, workers)
+            if len(move_scores) < len(legal_moves):
+                print(f"Deadline reached: {len(legal_moves) - len(move_scores)} of {len(legal_moves)} moves not analyzed.")
         
         original_turn = self.board.turn
-        
-        for i, move in enumerate(legal_moves):
-            # print(f"Evaluating line for move {i+1}/{len(legal_moves)}: {move.to_uci()}")
-            temp_board = self.board._copy()
-            temp_board.make_move(move) # Make the initial move
-            
-            # Evaluate the resulting position.
-            # The search function should find the best move for the *current* turn on temp_board
-            # which is now the opponent's turn.
-            
-            # Use a slightly shallower depth for evaluation during line analysis to save time.
-            # The score we get back is the value of the position *after* this move,
-            # assuming optimal play from the opponent.
-            
-            # The is_maximizing_player parameter for alpha_beta should be based on `temp_board.turn`
-            # which is now the opponent's turn.
-            
-            score_after_move = self.engine.alpha_beta(
-                temp_board, depth - 1, float('-inf'), float('inf'), temp_board.turn == 'white'
-            )
-            
-            move_scores.append({'move': move, 'score': score_after_move})
 
         # Sort by score. If White's turn, higher score is better. If Black's turn, lower score is better.
-        if original_turn == 'white': # White wants to maximize score
-            move_scores.sort(key=lambda x: x['score'], reverse=True)
-        else: # Black wants to minimize score
-            move_scores.sort(key=lambda x: x['score'], reverse=False)
+        # Scores from a shallower search than requested are not comparable: they go last, deepest first.
+        sign = 1 if original_turn == 'white' else -1
+        move_scores.sort(key=lambda x: (x.get('depth', depth), sign * x['score']), reverse=True)
 
-        print(f"Nodes searched during analysis: {self.engine.nodes_searched}")
+        print(f"Nodes searched during analysis: {nodes}")
+        if workers == 0:
+            tt = self.engine.tt
+            print(f"Transposition table: {tt.hits}/{tt.probes} hits, {tt.collisions} collisions")
+            self._print_search_stats()
         
         top_lines = []
         print("\n--- Top Suggested Moves ---")
         for i in range(min(num_lines, len(move_scores))):
             best_move_info = move_scores[i]
-            # For a full "line", you would recursively call search to trace the principal variation
-            # (the sequence of best moves) from this position. For now, just the first move.
-            print(f"Line {i+1}: {best_move_info['move'].to_uci()} (Score: {best_move_info['score']})")
+            pv = ' '.join(move.to_uci() for move in best_move_info['pv'])
+            partial = f", partial: depth {best_move_info['depth']}" if best_move_info.get('depth', depth) < depth else ""
+            print(f"Line {i+1}: {best_move_info['move'].to_uci()} (Score: {best_move_info['score']}{partial}) {pv}")
             top_lines.append(best_move_info) 
             
         return top_lines
 
+    def _analyze_moves_in_pool(self, legal_moves, depth, deadline, workers):
+        """
+        Searches the root moves in a pool of processes, each with its own engine, and collects the
+        results as they complete. Returns (move scores, nodes); the lines are just the moves, each
+        with the 'depth' its score comes from, less than the requested depth where the deadline
+        interrupted the move's deepening.
+        Each task carries the packed position (Board.to_bytes) and the key history, which is all a
+        worker needs to rebuild the board. At the deadline, queued moves are cancelled and running
+        ones stop at their engine's next limit check and report what they have.
+        """
+        packed_position = self.board.to_bytes()
+        key_history = self.board.key_history
+        moves_by_code = {move.code: move for move in legal_moves}
+        move_scores = []
+        nodes = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                                    initializer=_init_analysis_worker,
+                                                    initargs=(self.evaluator,)) as pool:
+            futures = [pool.submit(_analyze_root_move, packed_position, key_history, move.code, depth, deadline)
+                       for move in legal_moves]
+            remaining = max(deadline - time.time(), 0) if deadline is not None else None
+            try:
+                finished = list(concurrent.futures.as_completed(futures, timeout=remaining))
+            except concurrent.futures.TimeoutError:
+                # Queued moves are dropped; running ones stop at the deadline and still report the
+                # last depth they completed
+                finished = [future for future in futures if not future.cancel()]
+            for future in finished:
+                code, score, score_depth, move_nodes = future.result()
+                nodes += move_nodes
+                if score is not None:
+                    move = moves_by_code[code]
+                    move_scores.append({'move': move, 'score': score, 'pv': [move], 'depth': score_depth})
+        return move_scores, nodes
+
     def play_game(self, engine_color='black', depth=3):
         """
         Starts an interactive game against the AI.
@@ -165,4 +208,27 @@ class GameController:
             if self.board.is_checkmate() or self.board.is_stalemate() or self.board.is_draw():
                 break # Game ended by engine's move
 
-        print("\nGame over!")
\ No newline at end of file
+        print("\nGame over!")
+
+
+# The engine of an analysis worker process, kept for all the moves the process analyzes so that
+# they share its transposition table
+_analysis_engine = None
+
+
+def _init_analysis_worker(evaluator):
+    global _analysis_engine
+    _analysis_engine = Search(evaluator)
+
+
+def _analyze_root_move(packed_position, key_history, move_code, depth, deadline):
+    """
+    Runs in a worker process: returns (move code, score or None, depth of that score, nodes
+    searched).
+    """
+    engine = _analysis_engine
+    board = Board()
+    board.from_bytes(packed_position)
+    board.key_history = list(key_history) # For repetitions of positions before the root
+    score, score_depth = engine.score_move(board, Move.from_code(move_code), depth, deadline)
+    return move_code, score, score_depth, engine.nodes_searched
@@ -1,8 +1,38 @@
 # move.py
+# A move is packed into a single integer:
+#   bits 0-5   from square (row * 8 + col, a8 = 0 ... h1 = 63)
+#   bits 6-11  to square
+#   bits 12-14 promotion piece type code (0 = none, 1 = knight ... 4 = queen)
+#   bits 15-17 flags: capture, castling, en passant
+FROM_SHIFT = 0
+TO_SHIFT = 6
+PROMOTION_SHIFT = 12
+SQUARE_MASK = 0x3F
+PROMOTION_MASK = 0x7 << PROMOTION_SHIFT
+FLAG_CAPTURE = 1 << 15
+FLAG_CASTLING = 1 << 16
+FLAG_EN_PASSANT = 1 << 17
+# The bits that identify a move: two moves are equal when from, to and promotion match
+MOVE_KEY_MASK = (1 << 15) - 1
+
+PROMOTION_CODES = {'N': 1, 'B': 2, 'R': 3, 'Q': 4}
+PROMOTION_SYMBOLS = (None, 'N', 'B', 'R', 'Q')
+
+
+def encode_move(from_index, to_index, promotion_code=0, flags=0):
+    """Packs square indices, a promotion type code and FLAG_* bits into a move integer."""
+    return from_index | (to_index << TO_SHIFT) | (promotion_code << PROMOTION_SHIFT) | flags
+
+
 class Move:
+    """
+    A thin object view over a packed move integer (see the layout above).
+    The integer is available as .code; everything else is decoded from it on demand.
+    """
+    __slots__ = ('code',)
+
     def __init__(self, from_sq, to_sq, promotion_piece=None,
-                 is_capture=False, is_castling=False, is_en_passant=False,
-                 captured_piece=None):
+                 is_capture=False, is_castling=False, is_en_passant=False):
         """
         Initializes a Move object.
         from_sq: (row, col) tuple of the starting square.
@@ -11,32 +41,76 @@ class Move:
         is_capture: Boolean, True if the move is a capture.
         is_castling: Boolean, True if the move is castling.
         is_en_passant: Boolean, True if the move is an en passant capture.
-        captured_piece: The Piece object that was captured (if any).
         """
-        self.from_square = from_sq
-        self.to_square = to_sq
-        self.promotion_piece = promotion_piece
-        self.is_capture = is_capture
-        self.is_castling = is_castling
-        self.is_en_passant = is_en_passant
-        self.captured_piece = captured_piece
+        flags = 0
+        if is_capture: flags |= FLAG_CAPTURE
+        if is_castling: flags |= FLAG_CASTLING
+        if is_en_passant: flags |= FLAG_EN_PASSANT
+        promotion_code = PROMOTION_CODES[promotion_piece] if promotion_piece else 0
+        self.code = encode_move(from_sq[0] * 8 + from_sq[1], to_sq[0] * 8 + to_sq[1], promotion_code, flags)
+
+    @classmethod
+    def from_code(cls, code):
+        """Wraps an already packed move integer without re-encoding it."""
+        move = object.__new__(cls)
+        move.code = code
+        return move
+
+    @property
+    def from_index(self):
+        return self.code & SQUARE_MASK
+
+    @property
+    def to_index(self):
+        return (self.code >> TO_SHIFT) & SQUARE_MASK
+
+    @property
+    def from_square(self):
+        return divmod(self.code & SQUARE_MASK, 8)
+
+    @property
+    def to_square(self):
+        return divmod((self.code >> TO_SHIFT) & SQUARE_MASK, 8)
+
+    @property
+    def promotion_code(self):
+        return (self.code >> PROMOTION_SHIFT) & 0x7
+
+    @property
+    def promotion_piece(self):
+        return PROMOTION_SYMBOLS[(self.code >> PROMOTION_SHIFT) & 0x7]
+
+    @property
+    def is_capture(self):
+        return bool(self.code & FLAG_CAPTURE)
+
+    @property
+    def is_castling(self):
+        return bool(self.code & FLAG_CASTLING)
+
+    @property
+    def is_en_passant(self):
+        return bool(self.code & FLAG_EN_PASSANT)
 
     def __eq__(self, other):
         """Compares two Move objects for equality."""
         if not isinstance(other, Move):
             return NotImplemented
-        return (self.from_square == other.from_square and
-                self.to_square == other.to_square and
-                self.promotion_piece == other.promotion_piece)
+        return (self.code & MOVE_KEY_MASK) == (other.code & MOVE_KEY_MASK)
 
     def __hash__(self):
         """Enables Move objects to be used in sets or as dictionary keys."""
-        return hash((self.from_square, self.to_square, self.promotion_piece))
+        return hash(self.code & MOVE_KEY_MASK)
+
+    def __reduce__(self):
+        return (Move.from_code, (self.code,))
 
     def __repr__(self):
         """Developer-friendly string representation of the move."""
-        from_str = f"{chr(ord('a') + self.from_square[1])}{8 - self.from_square[0]}"
-        to_str = f"{chr(ord('a') + self.to_square[1])}{8 - self.to_square[0]}"
+        from_r, from_c = self.from_square
+        to_r, to_c = self.to_square
+        from_str = f"{chr(ord('a') + from_c)}{8 - from_r}"
+        to_str = f"{chr(ord('a') + to_c)}{8 - to_r}"
         promo_str = f"={self.promotion_piece}" if self.promotion_piece else ""
         move_type_flags = []
         if self.is_capture: move_type_flags.append('C')
@@ -47,11 +121,13 @@ class Move:
 
     def to_uci(self):
         """Converts the move to UCI (Universal Chess Interface) format."""
-        from_str = f"{chr(ord('a') + self.from_square[1])}{8 - self.from_square[0]}"
-        to_str = f"{chr(ord('a') + self.to_square[1])}{8 - self.to_square[0]}"
+        from_r, from_c = self.from_square
+        to_r, to_c = self.to_square
+        from_str = f"{chr(ord('a') + from_c)}{8 - from_r}"
+        to_str = f"{chr(ord('a') + to_c)}{8 - to_r}"
         promo_str = self.promotion_piece.lower() if self.promotion_piece else ""
         return f"{from_str}{to_str}{promo_str}"
 
     def __str__(self):
         """User-friendly string representation (defaults to UCI)."""
-        return self.to_uci()
\ No newline at end of file
+        return self.to_uci()
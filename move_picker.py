@@ -0,0 +1,123 @@
+# move_picker.py
+from array import array
+from move import Move, FLAG_CAPTURE, FLAG_EN_PASSANT, PROMOTION_MASK, PROMOTION_SHIFT, TO_SHIFT, SQUARE_MASK
+from piece import PAWN, KING
+
+# Stages, in the order the picker walks through them
+STAGE_HASH_MOVE = 0
+STAGE_CAPTURES = 1
+STAGE_KILLERS = 2
+STAGE_COUNTERMOVE = 3
+STAGE_QUIETS = 4
+STAGE_DONE = 5
+
+# Most valuable victim, least valuable attacker: MVV_LVA[victim * 6 + attacker] (piece type codes).
+# Any capture of a more valuable piece comes before every capture of a less valuable one, and
+# among captures of the same piece the cheapest attacker comes first.
+MVV_LVA = array('h', [(victim + 1) * 8 - attacker for victim in range(PAWN, KING + 1)
+                      for attacker in range(PAWN, KING + 1)])
+# Promotions rank as if they captured the piece they promote to
+PROMOTION_SCORES = array('h', [0] + [(promotion + 1) * 8 for promotion in range(1, 5)])
+
+# A quiet move's butterfly index (from and to square) is the low 12 bits of its code;
+# history tables hold one such block per colour
+BUTTERFLY_MASK = 0xFFF
+BUTTERFLY_SIZE = 64 * 64
+
+
+def capture_score(board, code):
+    """MVV-LVA ordering score of a capture or promotion: higher is searched first."""
+    score = PROMOTION_SCORES[(code >> PROMOTION_SHIFT) & 0x7]
+    if code & (FLAG_CAPTURE | FLAG_EN_PASSANT):
+        board_state = board.board_state
+        from_sq = code & SQUARE_MASK
+        attacker = board_state[from_sq >> 3][from_sq & 7].type_code
+        if code & FLAG_EN_PASSANT:
+            victim = PAWN
+        else:
+            to_sq = (code >> TO_SHIFT) & SQUARE_MASK
+            victim = board_state[to_sq >> 3][to_sq & 7].type_code
+        score += MVV_LVA[victim * 6 + attacker]
+    return score
+
+
+class MovePicker:
+    """
+    Hands out the legal moves of a position one at a time, best candidates first:
+
+        1. the hash move (the best move remembered for this position, e.g. from the previous iteration)
+        2. captures and promotions, by MVV-LVA
+        3. killer moves (quiet moves that caused a cutoff at the same ply elsewhere in the tree)
+        4. the countermove (the quiet move that last refuted the opponent's previous move)
+        5. the remaining quiet moves, by their butterfly history score
+
+    killers and countermove are move codes (0 = none); history is an array of BUTTERFLY_SIZE
+    counters per colour, white's first.
+    Each stage is generated only when the previous one is exhausted, so a node that cuts off on
+    the hash move or a capture never pays for generating its quiet moves.
+    The board must not be changed between steps except by make/unmake pairs.
+    """
+
+    def __init__(self, board, hash_move=None, killers=(), countermove=0, history=None):
+        self.board = board
+        self.hash_move = hash_move
+        self.killers = killers
+        self.countermove = countermove
+        self.history = history
+        self.stage = STAGE_HASH_MOVE
+        self.moves_picked = 0
+
+    def __iter__(self):
+        board = self.board
+        skip = set()
+
+        hash_move = self.hash_move
+        if hash_move is not None and board.is_legal_move(hash_move):
+            skip.add(hash_move.code)
+            self.moves_picked += 1
+            yield hash_move
+
+        self.stage = STAGE_CAPTURES
+        captures = board.generate_legal_captures()
+        captures.sort(key=lambda move: capture_score(board, move.code), reverse=True)
+        for move in captures:
+            if move.code not in skip:
+                self.moves_picked += 1
+                yield move
+
+        self.stage = STAGE_KILLERS
+        for code in self.killers:
+            move = self._refutation(code, skip)
+            if move is not None:
+                self.moves_picked += 1
+                yield move
+
+        self.stage = STAGE_COUNTERMOVE
+        move = self._refutation(self.countermove, skip)
+        if move is not None:
+            self.moves_picked += 1
+            yield move
+
+        self.stage = STAGE_QUIETS
+        quiets = board.generate_legal_quiet_moves()
+        history = self.history
+        if history is not None:
+            offset = 0 if board.turn == 'white' else BUTTERFLY_SIZE
+            quiets.sort(key=lambda move: history[offset + (move.code & BUTTERFLY_MASK)], reverse=True)
+        for move in quiets:
+            if move.code not in skip:
+                self.moves_picked += 1
+                yield move
+
+        self.stage = STAGE_DONE
+
+    def _refutation(self, code, skip):
+        """
+        A killer or countermove as a Move, or None. These come from other positions, so the move
+        must still be a legal quiet move here.
+        """
+        if (not code or code in skip or code & (FLAG_CAPTURE | PROMOTION_MASK)
+                or not self.board.is_legal_move(Move.from_code(code))):
+            return None
+        skip.add(code)
+        return Move.from_code(code)
@@ -0,0 +1,103 @@
+# perft.py
+# Move generation correctness gate and speed benchmark.
+#
+#   python perft.py                      # run the whole suite
+#   python perft.py --max-nodes 300000   # quick run: skip the expensive entries
+#   python perft.py --fen "<FEN>" --depth 4 --divide
+import argparse
+import sys
+import time
+
+from board import Board
+
+# (name, FEN, depth, expected leaf nodes) - published reference counts
+PERFT_SUITE = [
+    ("Start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 4, 197281),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3, 97862),
+    ("Position 3 (rook endgame, en passant pins)", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 5, 674624),
+    ("Position 4 (promotions, castling)", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3, 9467),
+    ("Position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 3, 62379),
+    ("Position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", 3, 89890),
+    ("Illegal en passant (horizontal pin)", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", 6, 1134888),
+    ("Illegal en passant (diagonal pin)", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", 6, 1015133),
+    ("En passant capture gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", 6, 1440467),
+    ("Short castling gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", 6, 661072),
+    ("Long castling gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", 6, 803711),
+    ("Castling rights lost by capture", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", 4, 1274206),
+    ("Castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", 4, 1720476),
+    ("Promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", 6, 3821001),
+    ("Discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", 5, 1004658),
+    ("Promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", 6, 217342),
+    ("Underpromote to give check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", 6, 92683),
+    ("Self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", 6, 2217),
+    ("Stalemate and checkmate (pawn)", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", 7, 567584),
+    ("Stalemate and checkmate (pieces)", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", 4, 23527),
+]
+
+
+def run_suite(max_nodes=None, use_cache=False, out=sys.stdout):
+    """
+    Runs every suite entry (skipping those expected to exceed max_nodes) and prints one line each
+    with the node count, time and nodes per second. Returns True if every count matched.
+    """
+    all_passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, depth, expected in PERFT_SUITE:
+        if max_nodes is not None and expected > max_nodes:
+            print(f"SKIP  {name} (depth {depth}, {expected} nodes)", file=out)
+            continue
+        board = Board(fen=fen)
+        start = time.perf_counter()
+        nodes = board.perft(depth, cache={} if use_cache else None)
+        elapsed = time.perf_counter() - start
+        total_nodes += nodes
+        total_time += elapsed
+
+        passed = nodes == expected
+        all_passed = all_passed and passed
+        status = "OK  " if passed else "FAIL"
+        nps = nodes / elapsed if elapsed > 0 else float('inf')
+        detail = "" if passed else f" (expected {expected})"
+        print(f"{status}  {name}: depth {depth} nodes {nodes}{detail}  {elapsed:.2f}s  {nps:,.0f} nps", file=out)
+
+    if total_time > 0:
+        print(f"\nTotal: {total_nodes} nodes in {total_time:.2f}s ({total_nodes / total_time:,.0f} nps)", file=out)
+    print("All perft counts match." if all_passed else "PERFT MISMATCH - move generation is broken.", file=out)
+    return all_passed
+
+
+def run_single(fen, depth, divide=False, use_cache=False, out=sys.stdout):
+    board = Board(fen=fen)
+    cache = {} if use_cache else None
+    start = time.perf_counter()
+    if divide:
+        counts = board.divide(depth, cache)
+        for uci in sorted(counts):
+            print(f"{uci}: {counts[uci]}", file=out)
+        nodes = sum(counts.values())
+    else:
+        nodes = board.perft(depth, cache)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else float('inf')
+    print(f"\nNodes: {nodes}  Time: {elapsed:.2f}s  NPS: {nps:,.0f}", file=out)
+    return nodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft move generation test and benchmark.")
+    parser.add_argument('--fen', help="Run a single position instead of the suite.")
+    parser.add_argument('--depth', type=int, default=3, help="Depth for --fen (default 3).")
+    parser.add_argument('--divide', action='store_true', help="With --fen, print the count per root move.")
+    parser.add_argument('--cache', action='store_true', help="Reuse counts of transposed positions.")
+    parser.add_argument('--max-nodes', type=int, help="Skip suite entries expected to exceed this many nodes.")
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        run_single(args.fen, args.depth, divide=args.divide, use_cache=args.cache)
+        return 0
+    return 0 if run_suite(max_nodes=args.max_nodes, use_cache=args.cache) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,74 @@
 # piece.py
+# Small-int codes shared by the board, the move encoding and the bitboard indices.
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+COLOR_NAMES = ('white', 'black')
+PIECE_TYPE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+COLOR_CODES = {'white': WHITE, 'black': BLACK}
+PIECE_TYPE_CODES = {name: code for code, name in enumerate(PIECE_TYPE_NAMES)}
+# Standard material values; the king is 0 for material evaluation (its real value is infinite)
+PIECE_VALUES = (1, 3, 3, 5, 9, 0)
+
+
 class Piece:
-    def __init__(self, piece_type, color):
-        self.type = piece_type  # e.g., 'pawn', 'knight', 'king'
-        self.color = color      # 'white' or 'black'
-        self.value = self._get_value() # Material value
-
-    def _get_value(self):
-        # Assign standard chess values
-        if self.type == 'pawn': return 1
-        if self.type == 'knight' or self.type == 'bishop': return 3
-        if self.type == 'rook': return 5
-        if self.type == 'queen': return 9
-        if self.type == 'king': return 0 # King value is infinite, but 0 for material evaluation
+    """
+    A chess piece. Pieces are immutable flyweights: there is exactly one instance per
+    (type, color), so Piece('pawn', 'white') returns the shared white pawn and pieces
+    can be compared with 'is'.
+    """
+    __slots__ = ('type', 'color', 'type_code', 'color_code', 'index', 'value', 'symbol')
+    _instances = {}
+
+    def __new__(cls, piece_type, color):
+        try:
+            return cls._instances[(piece_type, color)]
+        except KeyError:
+            raise ValueError(f"Invalid piece: {piece_type!r} / {color!r}") from None
+
+    @classmethod
+    def _create(cls, type_code, color_code):
+        piece = object.__new__(cls)
+        piece.type_code = type_code
+        piece.color_code = color_code
+        piece.index = color_code * 6 + type_code # Position in PIECES
+        piece.type = PIECE_TYPE_NAMES[type_code]   # e.g., 'pawn', 'knight', 'king'
+        piece.color = COLOR_NAMES[color_code]      # 'white' or 'black'
+        piece.value = PIECE_VALUES[type_code]      # Material value
+        symbol = 'PNBRQK'[type_code]
+        piece.symbol = symbol if color_code == WHITE else symbol.lower()
+        cls._instances[(piece.type, piece.color)] = piece
+        return piece
+
+    @staticmethod
+    def from_symbol(symbol):
+        """Returns the piece for a FEN letter such as 'N' or 'q'."""
+        try:
+            return PIECES_BY_SYMBOL[symbol]
+        except KeyError:
+            raise ValueError(f"Invalid piece symbol: {symbol!r}") from None
+
+    def __reduce__(self):
+        # Unpickle to the shared instance rather than a copy
+        return (Piece, (self.type, self.color))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __repr__(self):
         return f"<{self.color.capitalize()} {self.type.capitalize()}>"
 
     def __str__(self):
         # For board display
-        char_map = {
-            ('pawn', 'white'): 'P', ('knight', 'white'): 'N', ('bishop', 'white'): 'B',
-            ('rook', 'white'): 'R', ('queen', 'white'): 'Q', ('king', 'white'): 'K',
-            ('pawn', 'black'): 'p', ('knight', 'black'): 'n', ('bishop', 'black'): 'b',
-            ('rook', 'black'): 'r', ('queen', 'black'): 'q', ('king', 'black'): 'k',
-        }
-        return char_map.get((self.type, self.color), ' ')
+        return self.symbol
+
+
+# All 12 pieces, indexed by color_code * 6 + type_code
+PIECES = tuple(Piece._create(type_code, color_code) for color_code in (WHITE, BLACK) for type_code in range(6))
+PIECES_BY_SYMBOL = {piece.symbol: piece for piece in PIECES}
 
 # move.py
 class Move:
@@ -0,0 +1,114 @@
+# position_store.py
+# An append-only file of packed positions (see Board.to_bytes), memory-mapped for reading.
+#
+#   with PositionStore("positions.bin") as store:
+#       store.append(board)
+#       board = store[12345]           # random access without reading the rest of the file
+#       raw = store.view(1000, 2000)   # zero-copy memoryview of 1000 packed records
+#
+# The file is a 32-byte header followed by fixed-size records, so record i starts at byte
+# (i + 1) * PACKED_POSITION_SIZE and slices of the file are slices of the record array.
+import mmap
+import os
+import struct
+
+from board import Board, PACKED_POSITION_SIZE
+
+MAGIC = b'CHESSPOS'
+VERSION = 1
+_HEADER = struct.Struct('<8sII16x') # magic, version, record size
+HEADER_SIZE = _HEADER.size
+assert HEADER_SIZE == PACKED_POSITION_SIZE
+
+
+class PositionStore:
+    """Append-only store of packed positions with memory-mapped random access."""
+
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            header = self._file.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                raise ValueError(f"{path} is not a position store: truncated header.")
+            magic, version, record_size = _HEADER.unpack(header)
+            if magic != MAGIC or record_size != PACKED_POSITION_SIZE:
+                raise ValueError(f"{path} is not a position store.")
+            if version != VERSION:
+                raise ValueError(f"{path} has store version {version}, expected {VERSION}.")
+        else:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, PACKED_POSITION_SIZE))
+            self._file.flush()
+        self._map = None
+
+    def __len__(self):
+        size = os.fstat(self._file.fileno()).st_size
+        return (size - HEADER_SIZE) // PACKED_POSITION_SIZE
+
+    def append(self, board):
+        """Appends one position; returns its index."""
+        return self.append_packed(board.to_bytes())
+
+    def extend(self, boards):
+        """Appends many positions in one write; returns the number appended."""
+        data = b''.join(board.to_bytes() for board in boards)
+        self.append_packed(data)
+        return len(data) // PACKED_POSITION_SIZE
+
+    def append_packed(self, data):
+        """Appends already packed records (a multiple of PACKED_POSITION_SIZE bytes); returns the first new index."""
+        if len(data) % PACKED_POSITION_SIZE:
+            raise ValueError(f"Packed data must be a multiple of {PACKED_POSITION_SIZE} bytes, got {len(data)}.")
+        index = len(self)
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(data)
+        self._file.flush()
+        return index
+
+    def _mapped(self):
+        # Remap lazily when the file has grown since the last mapping. An old mapping is not closed
+        # explicitly: views handed out by view() may still point into it.
+        size = HEADER_SIZE + len(self) * PACKED_POSITION_SIZE
+        if self._map is None or len(self._map) < size:
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        return self._map
+
+    def record(self, index):
+        """The packed bytes of position 'index' (negative indices count from the end)."""
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError(f"Position index {index} out of range for a store of {count} positions.")
+        offset = HEADER_SIZE + index * PACKED_POSITION_SIZE
+        return self._mapped()[offset:offset + PACKED_POSITION_SIZE]
+
+    def __getitem__(self, index):
+        board = Board()
+        board.from_bytes(self.record(index))
+        return board
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def view(self, start=0, stop=None):
+        """
+        A zero-copy memoryview of the packed records start..stop, e.g. for
+        batch.PositionBatch.from_packed or numpy.frombuffer.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        return memoryview(self._mapped())[HEADER_SIZE + start * PACKED_POSITION_SIZE:
+                                          HEADER_SIZE + stop * PACKED_POSITION_SIZE]
+
+    def close(self):
+        self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
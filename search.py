@@ -1,127 +1,777 @@
 # search.py
-import math
+import multiprocessing
+import time
+from array import array
+from board import Board
+from endgame import is_recognized_draw
+from search_stats import SearchStats
+from move_picker import MovePicker, capture_score, BUTTERFLY_MASK, BUTTERFLY_SIZE, STAGE_QUIETS
+from move import Move, FLAG_CAPTURE, FLAG_EN_PASSANT, PROMOTION_MASK, PROMOTION_SHIFT, TO_SHIFT, SQUARE_MASK
+from piece import PIECE_VALUES, PAWN, KNIGHT, BISHOP, ROOK, QUEEN
+from tracing import SEARCH as SEARCH_TRACE
+from transposition import TranspositionTable, SharedTranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+
+MAX_PLY = 64 # Deepest ply that keeps its own killer moves
+# Mate scores: being checkmated 'ply' plies from the root scores -MATE + ply, so shorter mates
+# score higher for the winner. Any score beyond MATE_THRESHOLD is a mate, and INFINITE is outside
+# every score, for the open window.
+MATE = 100000
+MATE_THRESHOLD = MATE - 1000
+INFINITE = MATE + 1
+# History scores are halved once one of them passes this, so recent cutoffs keep their weight
+HISTORY_LIMIT = 1 << 20
+# The time and node limits are checked once every CHECK_INTERVAL nodes (a power of two)
+CHECK_INTERVAL = 1024
+# Moves the remaining clock time is assumed to be spread over
+MOVES_TO_GO = 30
+# Quiescence search: at most this many plies of captures past the horizon
+MAX_QUIESCENCE_DEPTH = 8
+# Delta pruning: skip a capture that cannot raise the score to alpha even with this much to spare
+DELTA_MARGIN = 200
+# Null-move pruning: from NULL_MOVE_DEPTH on, a side that can pass and still reach beta in a
+# search reduced by NULL_MOVE_REDUCTION (one more from NULL_MOVE_DEEP_DEPTH on) cuts off
+NULL_MOVE_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 7
+# Late move reductions: from LMR_DEPTH on, quiet moves after the first LMR_MOVES are searched
+# one ply shallower, two plies after the first LMR_LATE_MOVES
+LMR_DEPTH = 3
+LMR_MOVES = 3
+LMR_LATE_MOVES = 8
+# Seconds a helper process gets to notice the stop signal before it is terminated
+HELPER_JOIN_TIMEOUT = 1.0
+# Half-width of the root's aspiration window around the previous iteration's score, used from
+# ASPIRATION_DEPTH on: shallower iterations' scores swing too much between odd and even depths
+ASPIRATION_WINDOW = 50
+ASPIRATION_DEPTH = 4
 
 class Search:
-    def __init__(self, evaluator):
+    def __init__(self, evaluator, hash_size_mb=16, threads=1, tt=None, on_iteration=None):
+        """
+        threads: processes searching each position (Lazy SMP). With more than one, find_best_move
+        starts threads - 1 helper processes that search the same root into a transposition table
+        in shared memory; call close() when done with the Search to free it.
+        tt: a table to search into instead of a new one (helper processes pass the shared table).
+        on_iteration: called with self.stats after every completed iteration of a search.
+        """
         self.evaluator = evaluator
+        # Counters of the current search: all nodes (limits apply to these), quiescence nodes,
+        # the deepest ply reached, and beta cutoffs in alpha_beta, in total and on the first move.
+        # self.stats is assembled from them after every iteration.
         self.nodes_searched = 0
-        self.max_depth = 0
+        self.qnodes = 0
+        self.seldepth = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stats = SearchStats()
+        self.on_iteration = on_iteration
+        self.helper_nodes = 0 # Nodes searched by the helper processes of the last search
+        self.threads = threads
+        # Results of searched positions, kept across searches so later moves reuse them
+        if tt is None:
+            tt = SharedTranspositionTable(hash_size_mb) if threads > 1 else TranspositionTable(hash_size_mb)
+        self.tt = tt
+        # Limits of the running search; 'stopped' is the cooperative stop flag every node checks,
+        # 'stop_event' the stop signal a helper process gets from the main one
+        self.stopped = False
+        self.stop_event = None
+        self.deadline = None
+        self.node_limit = None
+        # Quiet move ordering, all indexed by plain integers:
+        # two killer move codes per ply (killers[2 * ply], killers[2 * ply + 1]): quiet moves that
+        # recently caused a cutoff at that ply,
+        self.killers = array('I', [0]) * (2 * MAX_PLY)
+        # butterfly history: per colour and from/to square, how much cutoff work a quiet move did,
+        self.history = array('l', [0]) * (2 * BUTTERFLY_SIZE)
+        # countermoves: per from/to square of a move, the quiet move that last refuted it,
+        self.countermoves = array('I', [0]) * BUTTERFLY_SIZE
+        # and the move code played at each ply of the current line, for the countermove lookup
+        self.ply_moves = array('I', [0]) * (MAX_PLY + 1)
+
+    def _update_quiet_cutoff(self, board, move, depth, ply):
+        """Rewards a quiet move that caused a beta cutoff in the killer, history and countermove tables."""
+        code = move.code
+        if code & (FLAG_CAPTURE | PROMOTION_MASK):
+            return # Captures are ordered by MVV-LVA already
+        if ply < MAX_PLY:
+            killers = self.killers
+            slot = 2 * ply
+            if killers[slot] != code:
+                killers[slot + 1] = killers[slot]
+                killers[slot] = code
+            previous = self.ply_moves[ply - 1]
+            if previous:
+                self.countermoves[previous & BUTTERFLY_MASK] = code
+
+        history = self.history
+        index = (0 if board.turn == 'white' else BUTTERFLY_SIZE) + (code & BUTTERFLY_MASK)
+        # Deeper cutoffs save more work and count for more
+        history[index] += depth * depth
+        if history[index] > HISTORY_LIMIT:
+            self._age_history()
+
+    def _age_history(self):
+        history = self.history
+        for index in range(len(history)):
+            history[index] >>= 1
+
+    def _move_picker(self, board, hash_move, ply):
+        if ply >= MAX_PLY:
+            return MovePicker(board, hash_move, history=self.history)
+        return MovePicker(board, hash_move,
+                          self.killers[2 * ply:2 * ply + 2],
+                          self.countermoves[self.ply_moves[ply - 1] & BUTTERFLY_MASK] if ply else 0,
+                          self.history)
+
+    def stop(self):
+        """Asks a running search to stop; it returns the best move of its last completed iteration."""
+        self.stopped = True
+
+    def close(self):
+        """Frees the shared transposition table of a multi-process Search."""
+        if isinstance(self.tt, SharedTranspositionTable):
+            self.tt.unlink()
+
+    def find_best_move(self, board, depth=None, movetime=None, wtime=None, btime=None,
+                       winc=0, binc=0, nodes=None):
+        """
+        Finds the best move by iterative deepening: complete searches of depth 1, 2, 3, ...
+        until one of the limits is reached.
+        depth: maximum depth.
+        movetime: milliseconds to spend on this move.
+        wtime, btime, winc, binc: the clock in milliseconds; a time budget is derived from the
+        side to move's remaining time and increment.
+        nodes: maximum number of nodes to search.
+        At least one limit is required. stop() ends the search early from another thread.
+        Returns the best Move object and its score (from White's point of view) from the last
+        completed iteration; None and the mated (or stalemate) score if there is no legal move.
+        The search's statistics are in self.stats until the next search replaces them.
+        """
+        budget = self._time_budget(board.turn, movetime, wtime, btime, winc, binc)
+        if depth is None and budget is None and nodes is None:
+            raise ValueError(f"find_best_move needs a depth, movetime, node limit or {board.turn}'s clock time.")
+        start_time = self._begin_search(budget, nodes)
+        sign = 1 if board.turn == 'white' else -1
+        if not board.generate_legal_moves():
+            # Game over at the root: mated at ply 0, or stalemate
+            return None, sign * (-MATE if board.is_king_in_check(board.turn) else 0)
+
+        helpers, stop_event, helper_nodes = self._start_helpers(board, depth)
+        try:
+            (best_move, best_score), _ = self._iterative_deepening(board, depth, start_time, budget,
+                                                                   self._search_best_move)
+        finally:
+            self._stop_helpers(helpers, stop_event, helper_nodes)
+
+        if best_move is None:
+            # Stopped before the first move was searched: any legal move beats none
+            best_move = board.generate_legal_moves()[0]
+        # The search scores for the side to move; callers get White's point of view, like evaluate
+        return best_move, sign * best_score
 
-    def find_best_move(self, board, depth):
+    def find_best_lines(self, board, num_lines=3, depth=None, movetime=None, nodes=None):
         """
-        Initiates the Alpha-Beta search to find the best move.
-        Returns the best Move object and its associated score.
+        MultiPV: finds the 'num_lines' best moves, deepening like find_best_move.
+        Each iteration searches the root once. The first num_lines moves get exact scores; every
+        later move is first tested with a null window at the score of the current last line, and
+        only a move that beats it is searched for its exact score and takes that line's place.
+        Returns the lines of the last completed iteration, best first, as dicts with the 'move',
+        its 'score' (from White's point of view) and 'pv', the expected line of play starting
+        with the move.
         """
+        if num_lines < 1:
+            return []
+        budget = movetime / 1000 if movetime is not None else None
+        if depth is None and budget is None and nodes is None:
+            raise ValueError("find_best_lines needs a depth, movetime or node limit.")
+        start_time = self._begin_search(budget, nodes)
+
+        def search_root(board, depth, previous):
+            lines, completed = self._search_root_lines(board, depth, num_lines,
+                                                       [move for _, move in previous or []])
+            best_score, best_move = lines[0] if lines else (0, None)
+            # Deeper iterations change nothing only once every line is a forced mate
+            proven = bool(lines) and all(self._is_proven_mate(score, depth) for score, _ in lines)
+            return lines, best_move, best_score, completed, proven
+
+        lines, completed_depth = self._iterative_deepening(board, depth, start_time, budget, search_root)
+        sign = 1 if board.turn == 'white' else -1
+        return [{'move': move, 'score': sign * score,
+                 'pv': self.principal_variation(board, move, completed_depth)}
+                for score, move in lines or []]
+
+    def score_move(self, board, move, depth, deadline=None):
+        """
+        The value of playing 'move', from White's point of view, deepening the position after it
+        like find_best_move up to 'depth'. For analyses that search every root move separately.
+        deadline: wall-clock time (time.time()) to stop at, which separate processes can share.
+        Returns the score and the depth of the last completed iteration, or (None, 0) if the
+        deadline passed before the first one finished.
+        """
+        budget = max(deadline - time.time(), 0) if deadline is not None else None
+        start_time = self._begin_search(budget, None)
+        if budget == 0:
+            return None, 0 # Not worth a single node
+
+        def search_root(board, depth, previous):
+            self.ply_moves[0] = move.code
+            board.make_move(move)
+            # The position after the move is scored for the opponent: negated, it is the mover's
+            score = -self.alpha_beta(board, depth - 1, -INFINITE, INFINITE, 1)
+            board.unmake_move(move)
+            completed = not self.stopped
+            return (score if completed else None), move, score, completed, self._is_proven_mate(score, depth)
+
+        score, score_depth = self._iterative_deepening(board, depth, start_time, budget, search_root)
+        if score is None:
+            return None, 0
+        return (score if board.turn == 'white' else -score), score_depth
+
+    def _search_root_lines(self, board, depth, num_lines, previous_moves):
+        """
+        One MultiPV iteration: searches every root move to 'depth', trying the previous
+        iteration's lines first. Returns ([(score, move), ...] best first, completed).
+        """
+        entry = self.tt.probe(board.zobrist_key)
+        hash_move = Move.from_code(entry[3]) if entry and entry[3] else None
+        moves = list(self._move_picker(board, hash_move, 0))
+        rank = {move.code: index for index, move in enumerate(previous_moves)}
+        moves.sort(key=lambda move: rank.get(move.code, len(rank)))
+
+        lines = []
+        for move in moves:
+            self.ply_moves[0] = move.code
+            board.make_move(move)
+            if len(lines) < num_lines:
+                score = -self.alpha_beta(board, depth - 1, -INFINITE, INFINITE, 1)
+            else:
+                # Only a move better than the last line matters, and only then its exact score
+                bound = lines[-1][0]
+                score = -self.alpha_beta(board, depth - 1, -bound - 1, -bound, 1)
+                if score > bound and not self.stopped:
+                    score = -self.alpha_beta(board, depth - 1, -INFINITE, -bound, 1)
+            board.unmake_move(move)
+            if self.stopped:
+                return lines, False
+            if SEARCH_TRACE.enabled:
+                SEARCH_TRACE.emit(f"depth {depth} root move {move.to_uci()} score {score}")
+
+            if len(lines) < num_lines or score > lines[-1][0]:
+                index = len(lines)
+                while index and lines[index - 1][0] < score:
+                    index -= 1
+                lines.insert(index, (score, move))
+                del lines[num_lines:]
+
+        if lines:
+            self.tt.store(board.zobrist_key, depth, lines[0][0], BOUND_EXACT, lines[0][1].code)
+        return lines, True
+
+    def principal_variation(self, board, move, max_length):
+        """
+        The expected line of play after 'move', at most max_length moves long, read from the best
+        moves stored in the transposition table. It ends early where an entry was overwritten.
+        """
+        pv = [move]
+        board.make_move(move)
+        seen = {board.zobrist_key}
+        while len(pv) < max_length:
+            entry = self.tt.probe(board.zobrist_key)
+            if entry is None or not entry[3]:
+                break
+            next_move = Move.from_code(entry[3])
+            if not board.is_legal_move(next_move):
+                break
+            board.make_move(next_move)
+            pv.append(next_move)
+            if board.zobrist_key in seen:
+                break # A repetition would loop forever
+            seen.add(board.zobrist_key)
+        for played in reversed(pv):
+            board.unmake_move(played)
+        return pv
+
+    def _begin_search(self, budget, nodes):
+        """Resets the per-search state, statistics and limits; returns the start time."""
         self.nodes_searched = 0 # Reset node count for each new search
-        self.max_depth = depth # Store the initial search depth
+        self.qnodes = self.seldepth = self.cutoffs = self.first_move_cutoffs = 0
+        self.stats = SearchStats()
+        self.tt.reset_counters()
+        # Killers belong to the positions of one search; history is only aged, as most of it stays useful
+        self.killers = array('I', [0]) * (2 * MAX_PLY)
+        self._age_history()
+        self.tt.new_search()
+        self.stopped = False
+
+        start_time = time.perf_counter()
+        self.deadline = start_time + budget if budget is not None else None
+        self.node_limit = nodes
+        return start_time
+
+    def _iterative_deepening(self, board, depth, start_time, budget, search_root, depth_offset=0):
+        """
+        Searches the root to depth 1, 2, ... (each plus depth_offset) until 'depth', a limit, or a
+        forced mate. search_root(board, depth, previous) runs one iteration, given the result of
+        the last one (None at first), and returns (result, best move, score (side to move's view),
+        completed, proven), proven meaning deeper iterations cannot change the result.
+        Returns the result of the deepest completed iteration and that depth.
+        """
+        result = None
+        result_depth = 0
+        for current_depth in range(1 + depth_offset, (depth or MAX_PLY) + 1):
+            iteration_start = (self.nodes_searched, time.perf_counter())
+            iteration, move, score, completed, proven = search_root(board, current_depth, result)
+            # An interrupted iteration only counts if no iteration has completed yet
+            if completed or result_depth == 0:
+                result, result_depth = iteration, current_depth
+            if completed and move is not None:
+                self._complete_iteration(current_depth, move, score if board.turn == 'white' else -score,
+                                         start_time, iteration_start)
+            if self.stopped:
+                break
+
+            elapsed = time.perf_counter() - start_time
+            if SEARCH_TRACE.enabled:
+                SEARCH_TRACE.emit(f"depth {current_depth} best {move} score {score} "
+                                  f"nodes {self.nodes_searched} time {elapsed:.3f}s")
+            if proven:
+                break # A forced mate within the full-width horizon: deeper iterations cannot improve on it
+            if budget is not None and elapsed >= budget / 2:
+                break # The next iteration takes several times longer and would not finish
+        self._update_stats(start_time)
+        return result, result_depth
+
+    def _search_best_move(self, board, depth, previous):
+        """The root search of find_best_move: one aspirated iteration around the previous score."""
+        move, score, completed = self._search_aspirated(board, depth, previous[1] if previous else 0)
+        return (move, score), move, score, completed, self._is_proven_mate(score, depth)
+
+    @staticmethod
+    def _is_proven_mate(score, depth):
+        """True for a forced mate found within the full-width 'depth' of the search."""
+        return abs(score) >= MATE_THRESHOLD and MATE - abs(score) <= depth
+
+    def _update_stats(self, start_time):
+        """Copies the search's counters and the table's into self.stats."""
+        stats = self.stats
+        stats.nodes = self.nodes_searched - self.qnodes
+        stats.qnodes = self.qnodes
+        stats.seldepth = max(stats.seldepth, self.seldepth)
+        stats.cutoffs = self.cutoffs
+        stats.first_move_cutoffs = self.first_move_cutoffs
+        stats.tt_probes = self.tt.probes
+        stats.tt_hits = self.tt.hits
+        stats.tt_stores = self.tt.stores
+        stats.time = time.perf_counter() - start_time
+
+    def _complete_iteration(self, depth, move, score, start_time, iteration_start):
+        """Records a completed iteration (score from White's point of view) and reports it."""
+        start_nodes, start_seconds = iteration_start
+        self._update_stats(start_time)
+        self.stats.record_iteration(depth, move, score, self.nodes_searched - start_nodes,
+                                    time.perf_counter() - start_seconds)
+        if self.on_iteration is not None:
+            self.on_iteration(self.stats)
+
+    def _start_helpers(self, board, depth):
+        """
+        Lazy SMP: starts threads - 1 helper processes that search the same root into the shared
+        transposition table. They need no other coordination: their stored results make the
+        main search's hash moves and cutoffs better. Every second helper searches one ply deeper
+        than the main search, so the processes do not all walk the same tree in lock step; their
+        separate killer and history tables diversify the move order further.
+        Returns the processes, their stop event and the array they report their node counts in.
+        """
+        if self.threads <= 1:
+            return [], None, None
+        stop_event = multiprocessing.Event()
+        helper_nodes = multiprocessing.Array('q', self.threads - 1, lock=False)
+        helpers = []
+        for index in range(self.threads - 1):
+            depth_offset = index % 2
+            process = multiprocessing.Process(
+                target=_run_helper,
+                args=(self.evaluator, self.tt.name, self.tt.size_mb, self.tt.generation,
+                      board.to_bytes(), board.key_history, depth + depth_offset if depth else None,
+                      depth_offset, stop_event, helper_nodes, index),
+                daemon=True)
+            process.start()
+            helpers.append(process)
+        return helpers, stop_event, helper_nodes
+
+    def _stop_helpers(self, helpers, stop_event, helper_nodes):
+        if not helpers:
+            return
+        stop_event.set()
+        for process in helpers:
+            process.join(HELPER_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.helper_nodes = sum(helper_nodes)
+
+    def _search_aspirated(self, board, depth, previous_score):
+        """
+        Searches the root to 'depth' with an aspiration window: a narrow window around the previous
+        iteration's score, which prunes far more than a full one. If the score falls outside it,
+        that side of the window is widened and the root searched again.
+        """
+        if depth < ASPIRATION_DEPTH or abs(previous_score) >= MATE_THRESHOLD:
+            return self._search_root(board, depth)
+        delta = ASPIRATION_WINDOW
+        alpha, beta = previous_score - delta, previous_score + delta
+        while True:
+            move, score, completed = self._search_root(board, depth, alpha, beta)
+            if not completed:
+                return move, score, False
+            if score <= alpha and alpha > -INFINITE:
+                alpha = max(score - delta, -INFINITE) # Failed low
+            elif score >= beta and beta < INFINITE:
+                beta = min(score + delta, INFINITE) # Failed high
+            else:
+                return move, score, True
+            delta *= 2
+            if SEARCH_TRACE.enabled:
+                SEARCH_TRACE.emit(f"depth {depth} aspiration re-search in ({alpha}, {beta})")
+
+    @staticmethod
+    def _time_budget(turn, movetime, wtime, btime, winc, binc):
+        """Seconds to spend on this move, or None if the search is not timed."""
+        if movetime is not None:
+            return movetime / 1000
+        time_left, increment = (wtime, winc) if turn == 'white' else (btime, binc)
+        if time_left is None:
+            return None
+        # Spread the clock over the moves still to play, use most of the increment,
+        # and never more than half of what is left
+        budget = min(time_left / MOVES_TO_GO + increment * 3 / 4, time_left / 2)
+        return max(budget, 0) / 1000
+
+    def _check_limits(self):
+        if (self.deadline is not None and time.perf_counter() >= self.deadline) or \
+           (self.node_limit is not None and self.nodes_searched >= self.node_limit) or \
+           (self.stop_event is not None and self.stop_event.is_set()):
+            self.stopped = True
+
+    def _search_root(self, board, depth, alpha=-INFINITE, beta=INFINITE):
+        """
+        Searches every root move to 'depth' within the window (alpha, beta).
+        Returns (best move, score, completed); the score is from the side to move's point of view
+        and, if it falls outside the window, only a bound on the true score. completed is False
+        if the search was stopped, in which case only the moves searched before the stop were compared.
+        """
+        original_alpha = alpha
+
+        # Moves come from the staged picker: the best move stored for this position (the previous
+        # iteration's best move), captures and promotions, then quiet moves
+        entry = self.tt.probe(board.zobrist_key)
+        hash_move = Move.from_code(entry[3]) if entry and entry[3] else None
 
         best_move = None
-        
-        # Determine initial alpha and beta bounds
-        alpha = float('-inf')
-        beta = float('inf')
-
-        # Get all legal moves for the current board state
-        legal_moves = board.generate_legal_moves()
-        
-        # Basic move ordering: try captures first (simple heuristic)
-        # More advanced engines use history heuristics, killer moves, MVV-LVA, etc.
-        legal_moves.sort(key=lambda move: move.is_capture, reverse=True)
-
-        if board.turn == 'white':
-            best_score = float('-inf')
-            for move in legal_moves:
-                temp_board = board._copy()
-                temp_board.make_move(move) # Make the move on the temporary board
-
-                # Call alpha_beta for the opponent's turn (minimizing player)
-                score = self.alpha_beta(temp_board, depth - 1, alpha, beta, False) # False = is_maximizing_player (for next turn)
-
-                if score > best_score:
-                    best_score = score
-                    best_move = move
-                
-                alpha = max(alpha, best_score) # Update alpha
-                if beta <= alpha:
-                    break # Alpha-beta cutoff (beta represents opponent's best score)
-        else: # Black's turn (minimizing player)
-            best_score = float('inf')
-            for move in legal_moves:
-                temp_board = board._copy()
-                temp_board.make_move(move) # Make the move on the temporary board
-
-                # Call alpha_beta for our turn (maximizing player for next turn)
-                score = self.alpha_beta(temp_board, depth - 1, alpha, beta, True) # True = is_maximizing_player (for next turn)
-
-                if score < best_score:
-                    best_score = score
-                    best_move = move
-                
-                beta = min(beta, best_score) # Update beta
-                if beta <= alpha:
-                    break # Alpha-beta cutoff (alpha represents our best score)
-        
-        return best_move, best_score
-
-    def alpha_beta(self, board, depth, alpha, beta, is_maximizing_player):
-        """
-        The Alpha-Beta Pruning search algorithm.
+        best_score = -INFINITE
+        for move in self._move_picker(board, hash_move, 0):
+            self.ply_moves[0] = move.code
+            board.make_move(move)
+            score = self._search_child(board, depth - 1, alpha, beta, 1, best_move is None)
+            board.unmake_move(move)
+            if self.stopped:
+                return best_move, best_score, False
+            if SEARCH_TRACE.enabled:
+                SEARCH_TRACE.emit(f"depth {depth} root move {move.to_uci()} score {score}")
+
+            if best_move is None or score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best_move is not None:
+            self.tt.store(board.zobrist_key, depth, best_score,
+                          self._bound(best_score, original_alpha, beta), best_move.code)
+        return best_move, best_score, True
+
+    def _search_child(self, board, depth, alpha, beta, ply, first, reduction=0):
+        """
+        Principal variation search of the position after a move, from the mover's point of view.
+        The first move is searched with the full window. Every later move only has to be shown to
+        be no better than alpha, which a null window (alpha, alpha + 1) does cheaply; only a move
+        that fails high is searched again with the full window for its exact score.
+        A late move is first searched 'reduction' plies shallower; only if it beats alpha there is
+        it verified at full depth.
+        """
+        if first:
+            return -self.alpha_beta(board, depth, -beta, -alpha, ply)
+        if reduction:
+            score = -self.alpha_beta(board, depth - reduction, -alpha - 1, -alpha, ply)
+            if score <= alpha or self.stopped:
+                return score
+        score = -self.alpha_beta(board, depth, -alpha - 1, -alpha, ply)
+        if alpha < score < beta and not self.stopped:
+            score = -self.alpha_beta(board, depth, -beta, -alpha, ply)
+        return score
+
+    @staticmethod
+    def _bound(score, alpha, beta):
+        """What a score searched with the window (alpha, beta) says about the true value."""
+        if score <= alpha:
+            return BOUND_UPPER
+        if score >= beta:
+            return BOUND_LOWER
+        return BOUND_EXACT
+
+    @staticmethod
+    def _has_pieces(board):
+        """True if the side to move has a piece besides its king and pawns."""
+        bitboards = board.bitboards[0 if board.turn == 'white' else 1]
+        return bool(bitboards[KNIGHT] | bitboards[BISHOP] | bitboards[ROOK] | bitboards[QUEEN])
+
+    def _evaluate(self, board):
+        """The static evaluation from the side to move's point of view."""
+        score = self.evaluator.evaluate(board)
+        return score if board.turn == 'white' else -score
+
+    def alpha_beta(self, board, depth, alpha, beta, ply=1):
+        """
+        Negamax alpha-beta search with principal variation search.
         board: The current board state.
-        depth: Current search depth (decrements with each recursive call).
-        alpha: Best score found so far for the maximizing player.
-        beta: Best score found so far for the minimizing player.
-        is_maximizing_player: True if it's the maximizing player's turn (White), False for minimizing (Black).
+        depth: Remaining search depth (decrements with each recursive call).
+        alpha, beta: The window; scores are from the side to move's point of view, so the caller
+        negates the result and passes (-beta, -alpha).
+        ply: Distance from the root, used to look up killer moves.
         """
         self.nodes_searched += 1
+        if ply > self.seldepth:
+            self.seldepth = ply
+        if not self.nodes_searched & (CHECK_INTERVAL - 1):
+            self._check_limits()
+        if self.stopped:
+            return 0 # The search is unwinding; the caller discards this value
+
+        # A position repeated inside the tree can be forced to repeat again: score it as a draw
+        # instead of searching the same cycle over and over. Game positions from before the root
+        # only count once they make a threefold repetition.
+        if board.is_search_repetition(ply):
+            return 0
+        # Dead draws and drawn endings (K vs K, KN vs K, KNN vs K, ...) need no search at all,
+        # unless the side to move is in check: KNN vs K can still end in a (helped) mate
+        if is_recognized_draw(board) and not board.is_king_in_check(board.turn):
+            return 0
+
+        # Mate distance pruning: even mating on the spot cannot beat a mate already found closer to
+        # the root, nor can being mated on the spot do worse than a faster mate against us
+        alpha = max(alpha, -MATE + ply)
+        beta = min(beta, MATE - ply - 1)
+        if alpha >= beta:
+            return alpha
 
-        # Base case: if depth is 0 or game is over (checkmate/stalemate)
+        # Base case: at the horizon, resolve pending captures before trusting the evaluation
         if depth == 0:
-            return self.evaluator.evaluate(board) # Evaluate the leaf node
+            return self.quiescence(board, alpha, beta, ply)
+
+        # A stored result that is deep enough and conclusive for this window answers the node
+        # outright; otherwise its best move is still the best first guess.
+        key = board.zobrist_key
+        hash_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, tt_score, tt_bound, tt_move = entry
+            tt_score = _score_from_tt(tt_score, ply)
+            if tt_depth >= depth:
+                if tt_bound == BOUND_EXACT:
+                    return tt_score
+                if tt_bound == BOUND_LOWER and tt_score >= beta:
+                    return tt_score
+                if tt_bound == BOUND_UPPER and tt_score <= alpha:
+                    return tt_score
+            if tt_move:
+                hash_move = Move.from_code(tt_move)
+        original_alpha = alpha
+        in_check = board.is_king_in_check(board.turn)
+
+        # Null-move pruning: let the opponent move twice in a row. If a reduced search still cannot
+        # bring the score below beta, a real move would do even better, so the node fails high
+        # without searching one. This is wrong in zugzwang, where every move makes things worse:
+        # never in check, nor with only pawns left, nor right after another null move.
+        if (depth >= NULL_MOVE_DEPTH and not in_check and abs(beta) < MATE_THRESHOLD
+                and ply < MAX_PLY and self.ply_moves[ply - 1]
+                and self._has_pieces(board) and self._evaluate(board) >= beta):
+            reduction = NULL_MOVE_REDUCTION + (depth >= NULL_MOVE_DEEP_DEPTH)
+            self.ply_moves[ply] = 0 # The null move: no move code
+            board.make_null_move()
+            score = -self.alpha_beta(board, max(depth - 1 - reduction, 0), -beta, -beta + 1, ply + 1)
+            board.unmake_null_move()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                # A mate found after passing is not a proven mate
+                return beta if score >= MATE_THRESHOLD else score
+
+        # Moves are generated stage by stage as the loop asks for them, so a cutoff on the hash
+        # move or an early capture never generates the quiet moves. Sort order within the stages
+        # (captures by MVV-LVA; killers, the countermove, then quiet moves by history) helps
+        # alpha-beta prune.
+        picker = self._move_picker(board, hash_move, ply)
+        best_move = None
+        best_score = -INFINITE
+        for move in picker:
+            if ply < MAX_PLY:
+                self.ply_moves[ply] = move.code
+            board.make_move(move)
+            # Late move reductions: quiet moves ordered after the hash move, captures, killers and
+            # countermove rarely turn out best
+            reduction = 0
+            if (depth >= LMR_DEPTH and picker.moves_picked > LMR_MOVES and not in_check
+                    and picker.stage == STAGE_QUIETS and not board.is_king_in_check(board.turn)):
+                reduction = 2 if picker.moves_picked > LMR_LATE_MOVES and depth > 3 else 1
+            score = self._search_child(board, depth - 1, alpha, beta, ply + 1, best_move is None, reduction)
+            board.unmake_move(move)
+            if self.stopped:
+                return 0
+            if best_move is None or score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if picker.moves_picked == 1:
+                            self.first_move_cutoffs += 1
+                        self._update_quiet_cutoff(board, move, depth, ply)
+                        break # Beta cutoff: the opponent will avoid this position
 
-        # Check for terminal nodes (checkmate or stalemate)
-        # Note: If it's checkmate, the score should be very high/low to indicate win/loss.
-        # This is typically handled by the evaluation function if it detects mate.
-        # Our `is_checkmate` and `is_stalemate` are called in `evaluate` when game ends.
-        
         # If no legal moves, it's either checkmate or stalemate
-        legal_moves = board.generate_legal_moves()
-        if not legal_moves:
-            if board.is_checkmate():
-                # Score depends on who is checkmated. If White is checkmated, Black wins (negative score).
-                # If Black is checkmated, White wins (positive score).
-                # Score should reflect a winning/losing position from White's perspective.
-                # A very large (positive or negative) score indicates a decisive outcome.
-                if board.turn == 'white': # White is checkmated, Black wins
-                    return float('-inf') + (self.max_depth - depth) # Smaller value for quicker mate
-                else: # Black is checkmated, White wins
-                    return float('inf') - (self.max_depth - depth) # Larger value for quicker mate
-            elif board.is_stalemate() or board.is_draw():
-                return 0 # Stalemate is a draw
-
-        # Sort moves for better pruning (captures first, then other heuristics if added)
-        # This is important for alpha-beta efficiency.
-        legal_moves.sort(key=lambda move: move.is_capture, reverse=True)
-
-
-        if is_maximizing_player: # Maximizing player (White)
-            max_eval = float('-inf')
-            for move in legal_moves:
-                temp_board = board._copy()
-                temp_board.make_move(move)
-                eval = self.alpha_beta(temp_board, depth - 1, alpha, beta, False) # Opponent's turn
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval) # Update alpha
-                if beta <= alpha:
-                    break # Beta cutoff
-            return max_eval
-        else: # Minimizing player (Black)
-            min_eval = float('inf')
-            for move in legal_moves:
-                temp_board = board._copy()
-                temp_board.make_move(move)
-                eval = self.alpha_beta(temp_board, depth - 1, alpha, beta, True) # Our turn
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval) # Update beta
-                if beta <= alpha:
-                    break # Alpha cutoff
-            return min_eval
\ No newline at end of file
+        if best_move is None:
+            if in_check:
+                return -MATE + ply # Checkmated: the worst score for the side to move, less so the later it comes
+            return 0 # Stalemate is a draw
+
+        self.tt.store(key, depth, _score_to_tt(best_score, ply),
+                      self._bound(best_score, original_alpha, beta), best_move.code)
+        return best_score
+
+    def quiescence(self, board, alpha, beta, ply, qdepth=0):
+        """
+        Searches captures and promotions only, so that leaf positions are evaluated once they are
+        quiet instead of in the middle of an exchange. Scores are negamax scores, as in alpha_beta.
+        The side to move may 'stand pat' on the static evaluation (it need not capture), which is
+        also the cutoff when it already reaches beta. In check there is no standing pat and
+        every evasion is searched. MAX_QUIESCENCE_DEPTH bounds the capture sequences.
+        """
+        self.nodes_searched += 1
+        self.qnodes += 1
+        if ply > self.seldepth:
+            self.seldepth = ply
+        if not self.nodes_searched & (CHECK_INTERVAL - 1):
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        # Check evasions are searched only on the first quiescence ply; deeper checks would turn the
+        # capture search into a full-width one
+        if not qdepth and board.is_king_in_check(board.turn):
+            moves = board.generate_legal_moves()
+            if not moves:
+                return -MATE + ply # Checkmated, as in alpha_beta
+            best = -INFINITE
+        else:
+            stand_pat = self._evaluate(board)
+            if qdepth >= MAX_QUIESCENCE_DEPTH or stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            moves = self._quiescence_moves(board, alpha - stand_pat)
+            best = stand_pat
+
+        for move in moves:
+            board.make_move(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1, qdepth + 1)
+            board.unmake_move(move)
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def _quiescence_moves(self, board, needed):
+        """
+        The captures and promotions worth searching, in MVV-LVA order. 'needed' is how
+        much material the side to move must win to reach its bound.
+        Dropped are captures that cannot win 'needed' even with DELTA_MARGIN to spare (delta
+        pruning), and captures of a defended piece by a more valuable one, which lose material
+        to the recapture.
+        """
+        board_state = board.board_state
+        defended = board.attacked_squares('black' if board.turn == 'white' else 'white')
+        scored = []
+        for move in board.generate_legal_captures():
+            gain = self._capture_gain(board, move)
+            if gain + DELTA_MARGIN <= needed:
+                continue
+            code = move.code
+            to_sq = (code >> TO_SHIFT) & SQUARE_MASK
+            if (defended >> to_sq) & 1:
+                from_sq = code & SQUARE_MASK
+                if board_state[from_sq >> 3][from_sq & 7].value * 100 > gain:
+                    continue
+            scored.append((capture_score(board, code), move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    @staticmethod
+    def _capture_gain(board, move):
+        """Material a capture or promotion wins, in centipawns, if the piece is not recaptured."""
+        code = move.code
+        gain = 0
+        if code & FLAG_EN_PASSANT:
+            gain = PIECE_VALUES[PAWN] * 100
+        elif code & FLAG_CAPTURE:
+            to_sq = (code >> TO_SHIFT) & SQUARE_MASK
+            gain = board.board_state[to_sq >> 3][to_sq & 7].value * 100
+        promotion_code = (code >> PROMOTION_SHIFT) & 0x7
+        if promotion_code:
+            gain += (PIECE_VALUES[promotion_code] - PIECE_VALUES[PAWN]) * 100
+        return gain
+
+
+def _run_helper(evaluator, tt_name, hash_size_mb, generation, packed_position, key_history,
+                depth, depth_offset, stop_event, helper_nodes, index):
+    """A Lazy SMP helper process: searches the position into the shared table until stopped."""
+    tt = SharedTranspositionTable(hash_size_mb, tt_name)
+    tt.generation = generation
+    board = Board()
+    board.from_bytes(packed_position)
+    board.key_history = list(key_history) # For repetitions of positions before the root
+    search = Search(evaluator, tt=tt)
+    search.stop_event = stop_event
+    try:
+        search._iterative_deepening(board, depth, time.perf_counter(), None, search._search_best_move,
+                                    depth_offset)
+    finally:
+        helper_nodes[index] = search.nodes_searched
+        tt.close()
+
+
+def _score_to_tt(score, ply):
+    """
+    A mate score is stored relative to the stored position rather than the root (mate in n from
+    here), so that it stays right wherever in a tree the position is found again.
+    """
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    """The inverse of _score_to_tt: a stored mate score made relative to the root again."""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
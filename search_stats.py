@@ -0,0 +1,100 @@
+# search_stats.py
+import json
+
+
+class SearchStats:
+    """
+    Counters and timings of one search (Search.stats), updated after every completed iteration.
+
+        stats.to_dict()    # everything below, plus one entry per iteration
+        stats.to_json()
+
+    nodes are alpha-beta (interior) nodes and qnodes quiescence nodes. depth is the last completed
+    iteration, seldepth the deepest ply any line reached. A cutoff is an alpha-beta node where a
+    move failed high; first_move_cutoffs counts those where the first move already did, the usual
+    measure of move ordering. The TT counters are the transposition table's own.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.seldepth = 0
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_stores = 0
+        self.time = 0.0 # seconds
+        # One dict per completed iteration: depth, best move, score (from White's point of view),
+        # the nodes of both kinds and the seconds the iteration took, and the totals so far
+        self.iterations = []
+
+    @property
+    def total_nodes(self):
+        return self.nodes + self.qnodes
+
+    @property
+    def nps(self):
+        return int(self.total_nodes / self.time) if self.time > 0 else 0
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def ebf(self):
+        """
+        Effective branching factor: how many times more nodes the last iteration took than the
+        one before it, or 0.0 before the second iteration.
+        """
+        if len(self.iterations) < 2 or not self.iterations[-2]['nodes']:
+            return 0.0
+        return self.iterations[-1]['nodes'] / self.iterations[-2]['nodes']
+
+    def record_iteration(self, depth, move, score, nodes, seconds):
+        """Adds a completed iteration: its best move and score, and the nodes and time it took."""
+        self.depth = depth
+        self.seldepth = max(self.seldepth, depth)
+        self.iterations.append({
+            'depth': depth,
+            'move': move.to_uci() if move is not None else None,
+            'score': score,
+            'nodes': nodes,
+            'time': seconds,
+            'total_nodes': self.total_nodes,
+            'total_time': self.time,
+        })
+        self.iterations[-1]['ebf'] = self.ebf
+
+    def to_dict(self):
+        return {
+            'depth': self.depth,
+            'seldepth': self.seldepth,
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'total_nodes': self.total_nodes,
+            'time': self.time,
+            'nps': self.nps,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoff_rate,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_hit_rate': self.tt_hit_rate,
+            'tt_stores': self.tt_stores,
+            'ebf': self.ebf,
+            'iterations': [dict(iteration) for iteration in self.iterations],
+        }
+
+    def to_json(self, **kwargs):
+        """The statistics as a JSON string; keyword arguments go to json.dumps (e.g. indent=2)."""
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def __repr__(self):
+        return (f"<SearchStats depth {self.depth}/{self.seldepth} nodes {self.nodes}+{self.qnodes} "
+                f"nps {self.nps} ebf {self.ebf:.2f}>")
@@ -0,0 +1,10 @@
+# test_batch.py
+from batch import PositionBatch
+from board import Board
+
+
+def test_legal_move_counts_of_four_field_fen_with_en_passant():
+    # Black's d4 pawn can take e3 en passant, which sends the row through the Board fallback
+    fen = "rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3"
+    counts = PositionBatch.from_fens([fen]).legal_move_counts()
+    assert counts[0] == len(Board(fen + " 0 1").generate_legal_moves())
@@ -0,0 +1,23 @@
+# test_board.py
+from board import Board
+
+
+def play(board, uci_moves):
+    """Plays moves given in UCI notation, so they become part of the board's history."""
+    for uci in uci_moves:
+        board.make_move(next(move for move in board.generate_legal_moves() if move.to_uci() == uci))
+
+
+def test_unusable_en_passant_square_does_not_prevent_repetition():
+    # After 1.e4 the e3 square is set, but no black pawn can take on it: the position is the same
+    # one that recurs after each knight dance
+    board = Board()
+    play(board, ["e2e4", "g8f6", "g1f3", "f6g8", "f3g1", "g8f6", "g1f3", "f6g8", "f3g1"])
+    assert board.is_draw()
+
+
+def test_usable_en_passant_square_is_part_of_the_key():
+    board = Board("4k3/8/8/8/3p4/8/4P3/4K3 w - - 0 1")
+    play(board, ["e2e4"])
+    assert board.zobrist_key != Board("4k3/8/8/8/3pP3/8/8/4K3 b - - 0 1").zobrist_key
+    assert board.zobrist_key == Board("4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1").zobrist_key
@@ -0,0 +1,46 @@
+# test_search.py
+from board import Board
+from evaluation import Evaluation
+from search import Search, MATE
+from test_board import play
+
+
+def test_game_history_repetition_is_not_a_draw_in_the_search():
+    # The position after d1c1 e8f8 c1d1 occurred once before the search root (with the king on
+    # e8 it did not): repeating it inside the search is no threefold repetition
+    board = Board("4k3/p7/8/8/8/8/P7/3QK3 w - - 0 1")
+    play(board, ["d1c1", "e8f8", "c1d1"])
+    fresh = Board(board.to_fen())
+
+    move, score = Search(Evaluation()).find_best_move(board, 4)
+    fresh_move, fresh_score = Search(Evaluation()).find_best_move(fresh, 4)
+    assert score == fresh_score
+    assert move.to_uci() == fresh_move.to_uci()
+
+
+def test_search_repetition_inside_the_searched_line():
+    board = Board("4k3/p7/8/8/8/8/P7/3QK3 w - - 0 1")
+    play(board, ["d1c1", "e8f8", "c1d1", "f8e8"])
+    # Back at the start position, 4 plies after it: a repetition if those plies were searched
+    assert board.is_search_repetition(4)
+    assert not board.is_search_repetition(3)
+
+
+def test_no_legal_moves_at_the_root():
+    # Fool's mate: White is mated on the spot
+    move, score = Search(Evaluation()).find_best_move(
+        Board("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3"), 3)
+    assert move is None and score == -MATE
+    # Black, to move, is mated: good for White
+    move, score = Search(Evaluation()).find_best_move(Board("R5k1/5ppp/8/8/8/8/8/6K1 b - - 1 1"), 3)
+    assert move is None and score == MATE
+
+    move, score = Search(Evaluation()).find_best_move(Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"), 3)
+    assert move is None and score == 0
+
+
+def test_mate_in_a_drawn_ending_is_still_mate():
+    # KNN vs K is drawn with correct play, but Nf7 here is mate
+    move, score = Search(Evaluation()).find_best_move(Board("7k/4N3/6K1/4N3/8/8/8/8 w - - 0 1"), 2)
+    assert move.to_uci() == "e5f7"
+    assert score == MATE - 1
@@ -0,0 +1,135 @@
+# tracing.py
+import atexit
+import collections
+import os
+
+# Diagnostics for the engine internals, split into one channel per subsystem.
+# Hot call sites guard every message with the channel's 'enabled' flag:
+#
+#     if BOARD.enabled:
+#         BOARD.emit(f"({r},{c}) attacked by {by_color}")
+#
+# so a disabled channel costs a single attribute check and the message is never even formatted.
+# Enabled channels hand their messages to a sink, which buffers them in memory (RingBufferSink)
+# or in batches before writing them to a file (FileSink).
+
+
+def _discard(message):
+    pass
+
+
+class Channel:
+    """A named trace channel. emit() is a no-op until the channel is enabled with a sink."""
+    __slots__ = ('name', 'enabled', 'sink', 'emit')
+
+    def __init__(self, name):
+        self.name = name
+        self.enabled = False
+        self.sink = None
+        self.emit = _discard
+
+    def attach(self, sink):
+        self.sink = sink
+        self.enabled = True
+        name = self.name
+        write = sink.write
+        self.emit = lambda message: write(name, message)
+
+    def detach(self):
+        self.sink = None
+        self.enabled = False
+        self.emit = _discard
+
+
+class RingBufferSink:
+    """Keeps the most recent 'capacity' trace records in memory as (channel, message) pairs."""
+
+    def __init__(self, capacity=10000):
+        self.records = collections.deque(maxlen=capacity)
+
+    def write(self, channel, message):
+        self.records.append((channel, message))
+
+    def flush(self):
+        pass
+
+    def lines(self):
+        """The buffered records formatted the same way FileSink writes them."""
+        return [f"[{channel}] {message}" for channel, message in self.records]
+
+    def clear(self):
+        self.records.clear()
+
+
+class FileSink:
+    """Appends trace records to a file, writing them out in batches of 'buffer_lines'."""
+
+    def __init__(self, path, buffer_lines=1000):
+        self.path = path
+        self.buffer_lines = buffer_lines
+        self._buffer = []
+        self._file = open(path, 'a')
+        atexit.register(self.flush)
+
+    def write(self, channel, message):
+        self._buffer.append(f"[{channel}] {message}\n")
+        if len(self._buffer) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.writelines(self._buffer)
+            self._buffer.clear()
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        atexit.unregister(self.flush)
+
+
+BOARD = Channel('board')
+MOVEGEN = Channel('movegen')
+SEARCH = Channel('search')
+EVAL = Channel('eval')
+
+CHANNELS = {channel.name: channel for channel in (BOARD, MOVEGEN, SEARCH, EVAL)}
+
+
+def enable(*names, sink=None):
+    """
+    Enables the named channels (all channels if none are given) and returns the sink they write to.
+    Without an explicit sink a new RingBufferSink is created.
+    """
+    if sink is None:
+        sink = RingBufferSink()
+    for name in names or CHANNELS:
+        if name not in CHANNELS:
+            raise ValueError(f"Unknown trace channel: {name!r}. Expected one of {sorted(CHANNELS)}.")
+        CHANNELS[name].attach(sink)
+    return sink
+
+
+def disable(*names):
+    """Disables the named channels (all channels if none are given), flushing their sinks."""
+    for name in names or CHANNELS:
+        channel = CHANNELS[name]
+        if channel.sink is not None:
+            channel.sink.flush()
+        channel.detach()
+
+
+def configure_from_env(environ=os.environ):
+    """
+    Enables channels listed in CHESS_TRACE (comma separated, or 'all').
+    Output goes to the file named by CHESS_TRACE_FILE if set, otherwise to a ring buffer.
+    """
+    spec = environ.get('CHESS_TRACE', '').strip()
+    if not spec:
+        return None
+    names = () if spec == 'all' else tuple(name.strip() for name in spec.split(',') if name.strip())
+    path = environ.get('CHESS_TRACE_FILE')
+    return enable(*names, sink=FileSink(path) if path else None)
+
+
+configure_from_env()
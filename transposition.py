@@ -0,0 +1,178 @@
+# transposition.py
+from array import array
+from multiprocessing import shared_memory
+
+# Bound types: what the stored score says about the position's true value
+BOUND_NONE = 0
+BOUND_EXACT = 1 # the true value
+BOUND_LOWER = 2 # the true value is at least the score (the search failed high)
+BOUND_UPPER = 3 # the true value is at most the score (the search failed low)
+
+# Entry data word layout:
+#   bits 0-17   best move code (0 = none)
+#   bits 18-25  depth
+#   bits 26-27  bound
+#   bits 28-35  generation (the search that wrote the entry)
+#   bits 36-63  score + SCORE_OFFSET
+MOVE_BITS = 18
+MOVE_MASK = (1 << MOVE_BITS) - 1
+DEPTH_SHIFT = 18
+BOUND_SHIFT = 26
+GENERATION_SHIFT = 28
+SCORE_SHIFT = 36
+SCORE_OFFSET = 1 << 27
+MAX_DEPTH = 0xFF
+
+ENTRY_WORDS = 2 # key ^ data, data
+BUCKET_ENTRIES = 2 # slot 0: depth-preferred, slot 1: always-replace
+BUCKET_WORDS = ENTRY_WORDS * BUCKET_ENTRIES
+BUCKET_BYTES = BUCKET_WORDS * 8
+
+
+class TranspositionTable:
+    """
+    A fixed-size hash table of search results, keyed by Board.zobrist_key.
+
+    The table is one preallocated array of 64-bit words, split into buckets of two entries.
+    The first entry of a bucket keeps the deepest result (replaced only by a result at least as
+    deep, or one left over from an earlier search); the second is overwritten by every other store.
+    Each entry stores key ^ data next to data, so an entry whose words do not belong together
+    (a torn or overwritten write) simply fails the key check.
+    """
+
+    def __init__(self, size_mb=16):
+        self._set_size(size_mb)
+        self.table = array('Q', bytes(self.bucket_count * BUCKET_BYTES))
+
+    def _set_size(self, size_mb):
+        # A power-of-two bucket count lets the index be a mask of the key
+        buckets = 1
+        while (buckets * 2) * BUCKET_BYTES <= size_mb * 1024 * 1024:
+            buckets *= 2
+        self.bucket_count = buckets
+        self.size_mb = size_mb
+        self._mask = buckets - 1
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0 # probes that found the bucket occupied by other positions
+        self.stores = 0
+
+    def clear(self):
+        self.table = array('Q', bytes(self.bucket_count * BUCKET_BYTES))
+        self.generation = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.probes = self.hits = self.collisions = self.stores = 0
+
+    def new_search(self):
+        """Marks the start of a new search; entries from earlier searches become replaceable."""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key):
+        """Returns (depth, score, bound, move_code) stored for 'key', or None."""
+        self.probes += 1
+        table = self.table
+        base = (key & self._mask) * BUCKET_WORDS
+        occupied = False
+        for index in (base, base + ENTRY_WORDS):
+            data = table[index + 1]
+            if data:
+                if table[index] ^ data == key:
+                    self.hits += 1
+                    return ((data >> DEPTH_SHIFT) & 0xFF,
+                            (data >> SCORE_SHIFT) - SCORE_OFFSET,
+                            (data >> BOUND_SHIFT) & 0x3,
+                            data & MOVE_MASK)
+                occupied = True
+        if occupied:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move_code=0):
+        """Stores a search result; 'score' must be an integer that fits in 28 signed bits."""
+        table = self.table
+        base = (key & self._mask) * BUCKET_WORDS
+        depth = min(max(depth, 0), MAX_DEPTH)
+
+        # Keep the best move already known for this position if the new result has none
+        for index in (base, base + ENTRY_WORDS):
+            old = table[index + 1]
+            if old and table[index] ^ old == key and not move_code:
+                move_code = old & MOVE_MASK
+
+        old = table[base + 1]
+        old_depth = (old >> DEPTH_SHIFT) & 0xFF
+        old_generation = (old >> GENERATION_SHIFT) & 0xFF
+        if not old or depth >= old_depth or old_generation != self.generation or table[base] ^ old == key:
+            index = base
+        else:
+            index = base + ENTRY_WORDS
+
+        data = (move_code
+                | (depth << DEPTH_SHIFT)
+                | (bound << BOUND_SHIFT)
+                | (self.generation << GENERATION_SHIFT)
+                | ((score + SCORE_OFFSET) << SCORE_SHIFT))
+        table[index] = key ^ data
+        table[index + 1] = data
+        self.stores += 1
+
+    def hashfull(self):
+        """Permille of the first 1000 buckets' entries written during the current search."""
+        table = self.table
+        used = 0
+        sample = min(1000, self.bucket_count)
+        for bucket in range(sample):
+            for index in (bucket * BUCKET_WORDS, bucket * BUCKET_WORDS + ENTRY_WORDS):
+                data = table[index + 1]
+                if data and (data >> GENERATION_SHIFT) & 0xFF == self.generation:
+                    used += 1
+        return used * 1000 // (sample * BUCKET_ENTRIES)
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    A TranspositionTable whose words live in multiprocessing.shared_memory, so that several
+    search processes read and write one table.
+
+        tt = SharedTranspositionTable(64)                     # creates the block
+        helper_tt = SharedTranspositionTable(64, tt.name)     # attaches to it, in another process
+
+    There are no locks: two processes writing the same entry at once can leave words from both,
+    and such a torn entry fails the key ^ data check like any other foreign entry. The counters
+    and the generation are per process. The creating process should call unlink() when done.
+    """
+
+    def __init__(self, size_mb=16, name=None):
+        self._set_size(size_mb)
+        size = self.bucket_count * BUCKET_BYTES
+        if name is None:
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+            if self._memory.size < size:
+                raise ValueError(f"Shared memory block {name} holds {self._memory.size} bytes, "
+                                 f"a {size_mb} MB table needs {size}.")
+        self.table = self._memory.buf[:size].cast('Q')
+
+    @property
+    def name(self):
+        """The shared memory block's name, for attaching from another process."""
+        return self._memory.name
+
+    def clear(self):
+        self.table[:] = array('Q', bytes(self.bucket_count * BUCKET_BYTES))
+        self.generation = 0
+        self.reset_counters()
+
+    def close(self):
+        """Detaches this process from the table."""
+        self.table.release()
+        self._memory.close()
+
+    def unlink(self):
+        """Detaches and frees the shared memory block; other processes must have closed it."""
+        self.close()
+        self._memory.unlink()